@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+
+# --- Acciones rapidas del menu contextual ("Eliminar en N dias") ---
+# Uso: pythonw tempodel_add_context.py "<ruta>" <dias>
+# No necesitan ventana: no se importa tkinter ni la GUI. Primero se intenta la API local del checker
+# (una ida y vuelta por el pipe) y solo si no esta corriendo se carga el store para escribir el journal.
+COLD_START_BUDGET_MS = 150 # Presupuesto de arranque en frio (interprete + imports), ver --measure
+MEASURE_RUNS = 15
+
+def add_from_context(path, days):
+    path = os.path.abspath(path)
+    delete_at = time.time() + float(days) * 86400
+    from tempodel_ipc import call, IpcUnavailable
+    try:
+        call('add', path=path, delete_at=delete_at)
+        return True
+    except IpcUnavailable:
+        pass
+    from tempodel_store import add_items
+    return add_items([(path, delete_at, False, None)])
+
+def measure(runs=MEASURE_RUNS):
+    # Mide el arranque en frio del camino rapido (proceso nuevo con los mismos imports, sin escribir nada)
+    import subprocess
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--noop"], check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    median = samples[len(samples) // 2]
+    print(f"Arranque en frio: mediana {median:.0f} ms, max {samples[-1]:.0f} ms (presupuesto {COLD_START_BUDGET_MS} ms)")
+    return median <= COLD_START_BUDGET_MS
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args == ["--noop"]:
+        import tempodel_ipc, tempodel_store # Lo mismo que importa una alta cuando el checker no esta corriendo
+        sys.exit(0)
+    if args == ["--measure"]:
+        sys.exit(0 if measure() else 1)
+    if len(args) != 2:
+        print("Uso: python tempodel_add_context.py <ruta> <dias>"); sys.exit(2)
+    try:
+        ok = add_from_context(args[0], args[1])
+    except ValueError as e: # Dias no numericos
+        print(f"ERROR: {e}"); ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import subprocess
+
+# --- Benchmarks del store y del motor de caducidad ---
+# Uso: python tempodel_bench.py [--sizes 1000,10000,100000] [--backend json|sqlite] [--format json|columnar] [--output res.json]
+# Cada tamaño corre en un proceso propio con TEMPODEL_DATA_DIR apuntando a una carpeta temporal: no toca
+# el schedule real y el pico de memoria (RSS) es el de ese tamaño. Los logs del proceso se descartan.
+DEFAULT_SIZES = (1000, 10000, 100000)
+FILES_PER_DIR = 1000 # Items sinteticos por carpeta padre
+REPEAT_RUNS = 3 # Repeticiones de load/save/refresco/alta en bloque
+SINGLE_ADDS = 100 # Altas individuales (latencia por alta)
+BULK_ADD_ITEMS = 1000 # Items por alta en bloque
+IDLE_TICKS = 200 # Vueltas del motor sin nada caducado
+DRAIN_ITEMS = 2000 # Items caducados (con archivos reales) para medir el vaciado del backlog
+
+def percentiles(samples):
+    # Latencias en ms: p50/p90/p99/max (rango mas cercano)
+    if not samples: return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"n": len(ordered), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+
+def timed(fn, runs):
+    samples = []; result = None
+    for _ in range(runs):
+        start = time.perf_counter(); result = fn(); samples.append(time.perf_counter() - start)
+    return samples, result
+
+def peak_rss_bytes():
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+        class _PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+        counters = _PROCESS_MEMORY_COUNTERS(); counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb): return None
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024 # Linux lo da en KB
+
+def _touch_files(directory, count, prefix):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"{prefix}{i:06d}.dat")
+        with open(path, 'wb') as f: f.write(b"x")
+        paths.append(path)
+    return paths
+
+def _fixture_dir_with_files(path, files=3):
+    _touch_files(path, files, "f")
+    return path
+
+def synthetic_items(root, size, now):
+    # Mezcla fija: 80% archivos, 10% carpetas, 10% carpetas periodicas. Ninguno caducado ni existente en disco.
+    from tempodel_store import ScheduleItem
+    items = []
+    for i in range(size):
+        parent = os.path.join(root, f"d{i // FILES_PER_DIR:05d}")
+        delete_at = now + 86400 + i
+        if i % 10 == 8: items.append(ScheduleItem(os.path.join(parent, f"dir{i:07d}"), delete_at, True))
+        elif i % 10 == 9: items.append(ScheduleItem(os.path.join(parent, f"per{i:07d}"), delete_at, True, True, 86400.0))
+        else: items.append(ScheduleItem(os.path.join(parent, f"f{i:07d}.dat"), delete_at))
+    return items
+
+def run_size(size, data_dir):
+    # Se ejecuta en el proceso hijo (TEMPODEL_DATA_DIR ya apunta a data_dir)
+    import tempodel_store as store
+    import tempodel_engine as engine
+    fixture = os.path.join(data_dir, "fixture")
+    now = time.time()
+    results = {"size": size}
+    items = synthetic_items(os.path.join(fixture, "synthetic"), size, now)
+
+    samples, _ = timed(lambda: store.save_schedule(items), REPEAT_RUNS)
+    results["save"] = dict(percentiles(samples), items_per_s=size / min(samples))
+    def cold_load():
+        store._snapshot_cache.clear() # Sin la cache de shards del proceso: parseo completo
+        return store.load_items()
+    samples, loaded = timed(cold_load, REPEAT_RUNS)
+    assert len(loaded) == size, f"load_items devolvio {len(loaded)} de {size}"
+    results["load"] = dict(percentiles(samples), items_per_s=size / min(samples))
+    samples, _ = timed(store.load_items, REPEAT_RUNS)
+    results["load_cached"] = dict(percentiles(samples), items_per_s=size / min(samples))
+    samples, _ = timed(store.load_schedule, 1)
+    results["load_dicts"] = dict(percentiles(samples), items_per_s=size / min(samples))
+    try:
+        from tempodel_gui import VirtualScheduleView # Importa tkinter, pero no abre ninguna ventana
+        samples, _ = timed(lambda: VirtualScheduleView.build_model(store.load_items()), REPEAT_RUNS)
+        results["refresh_list"] = percentiles(samples)
+    except ImportError as e:
+        results["refresh_list"] = {"skipped": str(e)}
+
+    single_paths = _touch_files(os.path.join(fixture, "single"), SINGLE_ADDS, "s")
+    samples = []
+    for path in single_paths:
+        start = time.perf_counter(); store.add_item_to_schedule(path, now + 7 * 86400); samples.append(time.perf_counter() - start)
+    results["add_single"] = dict(percentiles(samples), items_per_s=len(samples) / sum(samples))
+    bulk_paths = _touch_files(os.path.join(fixture, "bulk"), BULK_ADD_ITEMS, "b")
+    samples, _ = timed(lambda: store.add_items([(p, now + 7 * 86400, False, None) for p in bulk_paths]), REPEAT_RUNS)
+    results["add_bulk"] = dict(percentiles(samples), items_per_s=BULK_ADD_ITEMS / min(samples))
+
+    scheduler, reader = engine.create_scheduler()
+    samples, _ = timed(lambda: engine.sync_scheduler(scheduler, reader), 1)
+    results["scheduler_build"] = percentiles(samples)
+    samples = []
+    for _ in range(IDLE_TICKS):
+        start = time.perf_counter()
+        engine.sync_scheduler(scheduler, reader); engine.check_and_delete(scheduler)
+        samples.append(time.perf_counter() - start)
+    results["tick_idle"] = percentiles(samples)
+
+    # Backlog: archivos y carpetas reales ya caducados, vaciados lote a lote como en el motor
+    drain_count = min(DRAIN_ITEMS, size)
+    drain_root = os.path.join(fixture, "drain")
+    drain_entries = []
+    for i, path in enumerate(_touch_files(drain_root, drain_count, "x")):
+        if i % 10 == 8:
+            os.remove(path); path = _fixture_dir_with_files(path + ".d")
+        drain_entries.append((path, now - 1, False, None))
+    store.add_items(drain_entries)
+    engine.sync_scheduler(scheduler, reader)
+    start = time.perf_counter(); batches = 0
+    while scheduler.count_due(time.time()) and batches < 10 * (drain_count // engine.BATCH_MAX_ITEMS + 1):
+        engine.check_and_delete(scheduler); engine.sync_scheduler(scheduler, reader); batches += 1
+    elapsed = time.perf_counter() - start
+    left = len(os.listdir(drain_root))
+    results["backlog_drain"] = {"items": drain_count, "seconds": elapsed, "batches": batches,
+                                "items_per_s": drain_count / elapsed if elapsed else None, "left_on_disk": left}
+    engine._deletion_pool.shutdown()
+    results["peak_rss_bytes"] = peak_rss_bytes()
+    return results
+
+def run(sizes, backend=None, snapshot_format=None):
+    report = {"python": sys.version.split()[0], "platform": platform.platform(),
+              "backend": backend or os.environ.get("TEMPODEL_STORE", "json"),
+              "snapshot_format": snapshot_format or os.environ.get("TEMPODEL_SNAPSHOT_FORMAT", "json"), "results": []}
+    try:
+        import orjson # noqa: F401
+        report["orjson"] = True
+    except ImportError:
+        report["orjson"] = False
+    for size in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"tempodel-bench-{size}-")
+        result_path = os.path.join(data_dir, "result.json")
+        env = dict(os.environ, TEMPODEL_DATA_DIR=data_dir)
+        if backend: env["TEMPODEL_STORE"] = backend
+        if snapshot_format: env["TEMPODEL_SNAPSHOT_FORMAT"] = snapshot_format
+        try:
+            print(f"Midiendo {size} items...", file=sys.stderr)
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(size), result_path],
+                           env=env, stdout=subprocess.DEVNULL, check=True)
+            with open(result_path, 'r', encoding='utf-8') as f: report["results"].append(json.load(f))
+        except subprocess.CalledProcessError as e:
+            report["results"].append({"size": size, "error": f"el proceso de medida fallo (codigo {e.returncode})"})
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+def _option(args, name, default=None):
+    return args[args.index(name) + 1] if name in args and args.index(name) + 1 < len(args) else default
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--child"]:
+        result = run_size(int(args[1]), os.path.dirname(args[2]))
+        with open(args[2], 'w', encoding='utf-8') as f: json.dump(result, f)
+        sys.exit(0)
+    try:
+        sizes = [int(s) for s in _option(args, "--sizes", ",".join(map(str, DEFAULT_SIZES))).split(",") if s]
+    except ValueError:
+        print("Uso: python tempodel_bench.py [--sizes 1000,10000] [--backend json|sqlite] [--format json|columnar] [--output fichero]"); sys.exit(2)
+    report = run(sizes, _option(args, "--backend"), _option(args, "--format"))
+    output = json.dumps(report, indent=2)
+    if _option(args, "--output"):
+        with open(_option(args, "--output"), 'w', encoding='utf-8') as f: f.write(output + "\n")
+    print(output)
+    sys.exit(1 if any("error" in r for r in report["results"]) else 0)
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+
+from tempodel_ipc import call, IpcUnavailable
+
+# Cliente ligero para la integracion con el shell: habla con el checker por la API local y,
+# si no esta corriendo, escribe directamente en el store (mismo resultado, algo mas lento).
+USAGE = """Uso:
+  python tempodel_client.py add <dias> <ruta> [<ruta> ...] [--periodic [--max <tamaño, p.ej. 20G>]]
+  python tempodel_client.py rule <dias> <carpeta> <patron> [--cada <horas>] [--atime]
+  python tempodel_client.py remove <ruta> [<ruta> ...]
+  python tempodel_client.py list
+  python tempodel_client.py due"""
+
+def add_items(entries):
+    # entries = [(ruta, delete_at, periodic, duration[, max_bytes])]: una sola peticion (o un solo append) para todas
+    entries = [(os.path.abspath(entry[0]),) + tuple(entry[1:4]) + (entry[4] if len(entry) > 4 else None,) for entry in entries]
+    try: return bool(call('add', items=[{"path": p, "delete_at": d, "periodic": per, "duration": dur, "max_bytes": cap}
+                                        for p, d, per, dur, cap in entries]))
+    except IpcUnavailable:
+        from tempodel_store import add_items as store_add_items
+        return store_add_items(entries)
+
+def add_item(path, delete_at, periodic=False, duration=None):
+    return add_items([(path, delete_at, periodic, duration)])
+
+def add_rule(root, pattern, older_than_seconds, interval_seconds=None, age_field='mtime'):
+    root = os.path.abspath(root)
+    try: return bool(call('add_rule', root=root, pattern=pattern, older_than=older_than_seconds, interval=interval_seconds, age=age_field))
+    except IpcUnavailable:
+        from tempodel_store import add_rule as store_add_rule
+        return store_add_rule(root, pattern, older_than_seconds, interval_seconds, age_field)
+
+def remove_items(paths):
+    paths = [os.path.abspath(path) for path in paths]
+    try: return bool(call('remove', paths=paths))
+    except IpcUnavailable:
+        from tempodel_store import remove_items as store_remove_items
+        return store_remove_items(paths)
+
+def remove_item(path):
+    return remove_items([path])
+
+def list_items():
+    try: return call('list')
+    except IpcUnavailable:
+        from tempodel_store import load_schedule
+        return load_schedule()
+
+def due_items(before=None):
+    try: return call('due', before=before)
+    except IpcUnavailable:
+        from tempodel_store import load_schedule, delete_at_of
+        before = before or time.time()
+        return sorted((item for item in load_schedule() if delete_at_of(item) <= before), key=delete_at_of)
+
+def _print_items(items):
+    for item in items:
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['delete_at']))
+        print(f"{when}  {'[R] ' if item.get('rule') else '[P] ' if item.get('periodic') else ''}{item['path']}")
+
+def _take_option(args, name, example):
+    # Quita '<name> <valor>' de args y devuelve el valor (None si no esta). Sin valor detras: error y salida
+    if name not in args: return None
+    position = args.index(name)
+    if position + 1 >= len(args) or args[position + 1].startswith("--"):
+        print(f"ERROR: {name} necesita {example}", file=sys.stderr); sys.exit(2)
+    value = args[position + 1]
+    del args[position:position + 2]
+    return value
+
+def _take_flag(args, name):
+    present = name in args
+    while name in args: args.remove(name)
+    return present
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else None
+    # Las opciones se sacan primero (pueden ir en cualquier posicion); lo que queda son los posicionales
+    max_size = _take_option(args, "--max", "un tamaño (p.ej. --max 20G)") if command == "add" else None
+    periodic = _take_flag(args, "--periodic") if command == "add" else False
+    interval_hours = _take_option(args, "--cada", "un numero de horas (p.ej. --cada 24)") if command == "rule" else None
+    use_atime = _take_flag(args, "--atime") if command == "rule" else False
+    unknown = [a for a in args[1:] if a.startswith("--")] if command in ("add", "rule") else []
+    if unknown:
+        print(f"ERROR: Opcion desconocida: {unknown[0]}\n{USAGE}", file=sys.stderr); sys.exit(2)
+    try:
+        if command == "add" and len(args) >= 3:
+            duration = float(args[1]) * 86400
+            max_bytes = None
+            if max_size is not None:
+                from tempodel_store import parse_size
+                max_bytes = parse_size(max_size)
+            ok = add_items([(p, time.time() + duration, periodic, duration if periodic else None, max_bytes) for p in args[2:]])
+        elif command == "rule" and len(args) == 4:
+            interval = float(interval_hours) * 3600 if interval_hours is not None else None
+            ok = add_rule(args[2], args[3], float(args[1]) * 86400, interval, 'atime' if use_atime else 'mtime')
+        elif command == "remove" and len(args) >= 2:
+            ok = remove_items(args[1:])
+        elif command == "list":
+            _print_items(list_items()); ok = True
+        elif command == "due":
+            _print_items(due_items()); ok = True
+        else:
+            print(USAGE); sys.exit(2)
+    except (RuntimeError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr); ok = False
+    sys.exit(0 if ok else 1)
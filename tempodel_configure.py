@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import queue
+
+from tempodel_ipc import call, IpcServer, IpcUnavailable, GUI_IPC_ADDRESS, IPC_FAMILY
+
+# --- "Configurar borrado..." del menu contextual ---
+# Con una seleccion multiple Explorer lanza un proceso por archivo. Cada uno intenta entregar su ruta
+# a la GUI que ya escucha en GUI_IPC_ADDRESS y sale en milisegundos, sin importar tkinter. El primero
+# que no encuentra a nadie abre el listener (solo uno puede) y despues arranca la GUI.
+HANDOFF_TIMEOUT_SECONDS = 2
+HANDOFF_ATTEMPTS = 5 # Reintentos si otro proceso gano la carrera por el listener pero aun no atiende
+
+class PathCollector:
+    # Rutas recibidas por el listener de instancia unica. on_arrival() (lo pone la GUI) se llama desde
+    # el hilo del listener cada vez que llega un mensaje.
+    def __init__(self):
+        self.paths = queue.Queue()
+        self.on_arrival = None
+
+    def handle_request(self, request):
+        if request.get('op') == 'ping': return {"pid": os.getpid()}
+        if request.get('op') != 'configure': raise ValueError(f"Operacion desconocida: {request.get('op')!r}")
+        paths = request.get('paths') or [] # Sin rutas: solo traer la ventana al frente
+        if not all(isinstance(p, str) for p in paths): raise ValueError("'paths' debe ser una lista de rutas")
+        for path in paths: self.paths.put(path)
+        callback = self.on_arrival
+        if callback is not None: callback()
+        return len(paths)
+
+    def drain(self):
+        # Rutas pendientes sin duplicados, en orden de llegada
+        seen = {}
+        while True:
+            try: path = self.paths.get_nowait()
+            except queue.Empty: break
+            seen.setdefault(os.path.normpath(path), None)
+        return list(seen)
+
+def acquire_instance(paths):
+    # None si las rutas se entregaron a una GUI ya abierta (este proceso debe salir).
+    # Si no, (servidor o None, collector) con las rutas propias ya en la cola: este proceso abre la GUI.
+    paths = [os.path.abspath(p) for p in paths]
+    collector = PathCollector()
+    for attempt in range(HANDOFF_ATTEMPTS):
+        try:
+            call('configure', timeout=HANDOFF_TIMEOUT_SECONDS, address=GUI_IPC_ADDRESS, family=IPC_FAMILY, paths=paths)
+            return None
+        except (IpcUnavailable, RuntimeError):
+            pass
+        server = IpcServer(collector.handle_request, GUI_IPC_ADDRESS, IPC_FAMILY)
+        if server.start(quiet=True):
+            for path in paths: collector.paths.put(path)
+            return server, collector
+        time.sleep(0.02 * (attempt + 1))
+    # Sin listener propio ni ajeno que responda: abrir la GUI igualmente, sin instancia unica
+    for path in paths: collector.paths.put(path)
+    return None, collector
+
+if __name__ == "__main__":
+    instance = acquire_instance(sys.argv[1:])
+    if instance is None: sys.exit(0)
+    import tempodel_gui # Solo el proceso que abre la ventana paga el import de tkinter
+    tempodel_gui.main(*instance)
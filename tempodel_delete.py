@@ -0,0 +1,262 @@
+import os
+import sys
+import stat
+import time
+import fnmatch
+
+# --- Borrado de arboles de directorios ---
+# Recorrido iterativo con os.scandir: el tipo de cada entrada sale de la cache de DirEntry
+# (d_type en POSIX, datos de FindNextFile en Windows), asi que normalmente no hay un stat por entrada.
+# Donde el SO lo permite, los unlink/rmdir son relativos al descriptor del directorio (dir_fd),
+# lo que evita resolver rutas largas y no sigue enlaces simbolicos a mitad del borrado.
+PROGRESS_EVERY = 10000 # Cada cuantas entradas borradas se avisa al callback de progreso
+
+_SUPPORTS_DIR_FD = (os.scandir in os.supports_fd and os.open in os.supports_dir_fd
+                    and os.unlink in os.supports_dir_fd and os.rmdir in os.supports_dir_fd)
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_CLOEXEC', 0)
+_IS_WINDOWS = sys.platform == "win32"
+_FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+TOMBSTONE_PREFIX = ".tempodel-borrando-" # Carpetas retiradas (renombradas) cuyo borrado sigue en segundo plano
+
+class TreeRemovalStats:
+    __slots__ = ('files', 'dirs', 'scanned', 'bytes', 'errors', '_next_progress', '_progress', '_progress_every')
+
+    def __init__(self, progress=None, progress_every=PROGRESS_EVERY):
+        self.files = 0
+        self.dirs = 0
+        self.scanned = 0 # Entradas examinadas (solo remove_matching)
+        self.bytes = 0 # Tamaño borrado, solo donde el stat ya se tenia (remove_matching)
+        self.errors = [] # [(path, excepcion)]
+        self._progress = progress
+        self._progress_every = progress_every
+        self._next_progress = progress_every
+
+    @property
+    def total(self): return self.files + self.dirs
+
+    def _count(self, is_dir):
+        if is_dir: self.dirs += 1
+        else: self.files += 1
+        if self._progress is not None and self.total >= self._next_progress:
+            self._next_progress += self._progress_every
+            self._progress(self.files, self.dirs)
+
+def _is_real_dir(entry):
+    # Directorio a recorrer (no enlaces simbolicos ni junctions, que se borran como enlace)
+    try:
+        if not entry.is_dir(follow_symlinks=False): return False
+        if _IS_WINDOWS: # En Windows entry.stat(follow_symlinks=False) no hace syscall
+            return not (entry.stat(follow_symlinks=False).st_file_attributes & _FILE_ATTRIBUTE_REPARSE_POINT)
+        return True
+    except OSError:
+        return False
+
+def remove_tree(path, keep_root=False, progress=None, progress_every=PROGRESS_EVERY):
+    # Borra 'path' y todo su contenido (o solo el contenido si keep_root). No se detiene en el primer
+    # error: los acumula en stats.errors y sigue con el resto del arbol.
+    stats = TreeRemovalStats(progress, progress_every)
+    if not keep_root and os.path.islink(path):
+        os.unlink(path); stats._count(False)
+        return stats
+    if _SUPPORTS_DIR_FD: _remove_contents_fd(path, stats, follow_root=keep_root)
+    else: _remove_contents_paths(path, stats)
+    if not keep_root:
+        try:
+            os.rmdir(path); stats._count(True)
+        except OSError as e:
+            stats.errors.append((path, e))
+    return stats
+
+def _remove_contents_fd(root_path, stats, follow_root):
+    root_flags = _DIR_OPEN_FLAGS | (0 if follow_root else getattr(os, 'O_NOFOLLOW', 0))
+    root_fd = os.open(root_path, root_flags)
+    # Cada nivel: [fd, iterador scandir, nombre en el padre, ruta (solo para mensajes)]
+    stack = [[root_fd, os.scandir(root_fd), None, root_path]]
+    try:
+        while stack:
+            dir_fd, entries, name, dir_path = stack[-1]
+            try: entry = next(entries, None)
+            except OSError as e:
+                stats.errors.append((dir_path, e)); entry = None
+            if entry is None:
+                stack.pop()
+                entries.close(); os.close(dir_fd)
+                if name is not None:
+                    try:
+                        os.rmdir(name, dir_fd=stack[-1][0]); stats._count(True)
+                    except OSError as e: stats.errors.append((dir_path, e))
+                continue
+            if _is_real_dir(entry):
+                try:
+                    child_fd = os.open(entry.name, _DIR_OPEN_FLAGS | getattr(os, 'O_NOFOLLOW', 0), dir_fd=dir_fd)
+                except OSError as e:
+                    stats.errors.append((os.path.join(dir_path, entry.name), e)); continue
+                try: child_entries = os.scandir(child_fd)
+                except OSError as e:
+                    os.close(child_fd); stats.errors.append((os.path.join(dir_path, entry.name), e)); continue
+                stack.append([child_fd, child_entries, entry.name, os.path.join(dir_path, entry.name)])
+            else:
+                try:
+                    os.unlink(entry.name, dir_fd=dir_fd); stats._count(False)
+                except OSError as e: stats.errors.append((os.path.join(dir_path, entry.name), e))
+    finally:
+        for dir_fd, entries, _, _ in stack:
+            entries.close(); os.close(dir_fd)
+
+def _remove_path_entry(entry_path, is_dir):
+    remove = os.rmdir if is_dir else os.unlink
+    try:
+        remove(entry_path)
+    except PermissionError:
+        if not _IS_WINDOWS: raise
+        os.chmod(entry_path, stat.S_IWRITE) # Archivos de solo lectura en Windows
+        remove(entry_path)
+
+def _remove_contents_paths(root_path, stats):
+    # Variante por rutas (Windows): mismo recorrido iterativo, sin dir_fd
+    stack = [[os.scandir(root_path), None]]
+    try:
+        while stack:
+            entries, dir_path = stack[-1]
+            try: entry = next(entries, None)
+            except OSError as e:
+                stats.errors.append((dir_path or root_path, e)); entry = None
+            if entry is None:
+                stack.pop(); entries.close()
+                if dir_path is not None:
+                    try:
+                        _remove_path_entry(dir_path, True); stats._count(True)
+                    except OSError as e: stats.errors.append((dir_path, e))
+                continue
+            if _is_real_dir(entry):
+                try: stack.append([os.scandir(entry.path), entry.path])
+                except OSError as e: stats.errors.append((entry.path, e))
+            else:
+                try:
+                    # Los enlaces/junctions a directorios se quitan con rmdir, sin entrar en ellos
+                    _remove_path_entry(entry.path, entry.is_dir(follow_symlinks=False)); stats._count(False)
+                except OSError as e: stats.errors.append((entry.path, e))
+    finally:
+        for entries, _ in stack: entries.close()
+
+def remove_matching(root_path, pattern, older_than_seconds, age_field='mtime', recursive=True, now=None, progress=None,
+                    progress_every=PROGRESS_EVERY):
+    # Reglas de retencion: borra los archivos bajo root_path cuyo nombre cumple 'pattern' (fnmatch) y cuyo
+    # mtime/atime es anterior a now - older_than_seconds. Recorrido en streaming con os.scandir: nunca se
+    # tiene la lista entera en memoria, y solo se pide el stat de las entradas cuyo nombre coincide
+    # (en Windows ni eso, viene con la entrada). Las carpetas no se borran y no se entra en enlaces.
+    stats = TreeRemovalStats(progress, progress_every)
+    cutoff = (time.time() if now is None else now) - older_than_seconds
+    stack = [os.scandir(root_path)]
+    try:
+        while stack:
+            try: entry = next(stack[-1], None)
+            except OSError as e:
+                stats.errors.append((root_path, e)); entry = None
+            if entry is None:
+                stack.pop().close(); continue
+            stats.scanned += 1
+            if _is_real_dir(entry):
+                if recursive:
+                    try: stack.append(os.scandir(entry.path))
+                    except OSError as e: stats.errors.append((entry.path, e))
+                continue
+            if entry.is_dir(follow_symlinks=False) or not fnmatch.fnmatch(entry.name, pattern): continue
+            try:
+                entry_stat = entry.stat(follow_symlinks=False)
+                if getattr(entry_stat, 'st_' + age_field) >= cutoff: continue
+                _remove_path_entry(entry.path, False); stats._count(False)
+                stats.bytes += entry_stat.st_size
+            except FileNotFoundError: pass # Lo borro otro mientras tanto
+            except OSError as e: stats.errors.append((entry.path, e))
+    finally:
+        for entries in stack: entries.close()
+    return stats
+
+def _iter_file_entries(root_path, errors, recursive=True):
+    # (entry, lstat) de cada entrada que no es una carpeta a recorrer (archivos y enlaces) bajo root_path
+    stack = [os.scandir(root_path)]
+    try:
+        while stack:
+            try: entry = next(stack[-1], None)
+            except OSError as e:
+                errors.append((root_path, e)); entry = None
+            if entry is None:
+                stack.pop().close(); continue
+            if _is_real_dir(entry):
+                if recursive:
+                    try: stack.append(os.scandir(entry.path))
+                    except OSError as e: errors.append((entry.path, e))
+                continue
+            try: yield entry, entry.stat(follow_symlinks=False)
+            except FileNotFoundError: pass
+            except OSError as e: errors.append((entry.path, e))
+    finally:
+        for entries in stack: entries.close()
+
+class TreeSizeWalk:
+    # Suma de tamaños bajo root_path (sin seguir enlaces) que se puede hacer a trozos: step() para al pasar
+    # 'deadline' (time.monotonic) y la siguiente llamada sigue donde lo dejo. Solo guarda las carpetas
+    # pendientes y, como mucho, el listado abierto de la carpeta en curso.
+    CHECK_EVERY = 256 # Entradas entre consultas del reloj
+
+    def __init__(self, root_path):
+        self.stats = TreeRemovalStats()
+        self._pending = [root_path]
+        self._current = None # (os.scandir abierto, ruta)
+
+    def step(self, deadline=None):
+        # True cuando el recorrido ha terminado (stats.bytes es el total)
+        seen = 0
+        while True:
+            if self._current is None:
+                if not self._pending: return True
+                path = self._pending.pop()
+                try: self._current = (os.scandir(path), path)
+                except OSError as e:
+                    self.stats.errors.append((path, e)); continue
+            entries, path = self._current
+            try: entry = next(entries, None)
+            except OSError as e:
+                self.stats.errors.append((path, e)); entry = None
+            if entry is None:
+                self.close(); continue
+            if _is_real_dir(entry): self._pending.append(entry.path)
+            else:
+                try:
+                    self.stats.bytes += entry.stat(follow_symlinks=False).st_size; self.stats.scanned += 1
+                except FileNotFoundError: pass
+                except OSError as e: self.stats.errors.append((entry.path, e))
+            seen += 1
+            if deadline is not None and seen % self.CHECK_EVERY == 0 and time.monotonic() >= deadline: return False
+
+    def close(self):
+        if self._current is not None:
+            self._current[0].close(); self._current = None
+
+def trim_to_size(root_path, max_bytes, progress=None, progress_every=PROGRESS_EVERY):
+    # Tope de tamaño de una carpeta: borra sus archivos mas antiguos (por mtime) hasta que lo que queda
+    # ocupa como mucho max_bytes. Las carpetas se conservan. stats.bytes es lo borrado.
+    stats = TreeRemovalStats(progress, progress_every)
+    files = []; total = 0
+    for entry, entry_stat in _iter_file_entries(root_path, stats.errors):
+        if entry.is_dir(follow_symlinks=False): continue # Enlace/junction a carpeta: no ocupa, no se toca
+        files.append((entry_stat.st_mtime, entry_stat.st_size, entry.path)); total += entry_stat.st_size
+    stats.scanned = len(files)
+    if total <= max_bytes: return stats
+    files.sort()
+    for _, size, path in files:
+        if total <= max_bytes: break
+        try:
+            _remove_path_entry(path, False); stats._count(False)
+            stats.bytes += size
+        except FileNotFoundError: pass
+        except OSError as e:
+            stats.errors.append((path, e)); continue
+        total -= size
+    return stats
+
+def tombstone_path(path):
+    # Nombre junto a 'path' (mismo volumen: el rename es atomico) para retirar una carpeta antes de borrarla
+    parent, name = os.path.split(os.path.normpath(path))
+    return os.path.join(parent, f"{TOMBSTONE_PREFIX}{os.urandom(4).hex()}-{name}"[:255])
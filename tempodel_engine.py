@@ -0,0 +1,1151 @@
+import os
+import json
+import time
+import datetime
+import sys
+import traceback # Para logging de errores más detallado en consola
+import heapq
+import shutil
+import stat
+import select
+import ctypes
+import ctypes.util
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tempodel_metrics as metrics
+from tempodel_log import log_message
+from tempodel_lock import FileLock, lock_stats
+from tempodel_delete import remove_tree, remove_matching, TreeSizeWalk, trim_to_size, tombstone_path
+from tempodel_store import (STORE_BACKEND, DATA_DIR, SCHEDULE_FILE, parse_size, format_size, ScheduleReader, watched_files, read_generation, shard_key, shard_root,
+                            append_records, remove_record, reschedule_record, maybe_compact, trim_torn_tail)
+
+# --- Nucleo de caducidad compartido por tempodel_checker.py y tempodel_gui.py ---
+# Solo el proceso que tiene el lock de lider borra; el resto solo vigila el schedule
+# y avisa (on_change) para refrescar su vista. Si el lider muere, el SO libera el lock y otro lo toma.
+
+# --- Constantes y Configuración ---
+CHECK_INTERVAL_SECONDS_INTERNAL = 5 # Sondeo de cambios si no hay notificaciones nativas
+PRUNE_INTERVAL_SECONDS = 300 # Barrido de items desaparecidos que aun no estan 'due'
+DELETE_WORKERS = 8 # Hilos de borrado en paralelo
+VOLUME_CONCURRENCY = 2 # Borrados simultaneos como maximo sobre un mismo volumen (no saturar un disco)
+BATCH_MAX_ITEMS = 500 # Items caducados por lote; el progreso se guarda al terminar cada lote
+BATCH_TIME_BUDGET_SECONDS = 5.0 # Pasado este tiempo no se empiezan mas borrados en el lote
+LEADER_LOCK_FILE = SCHEDULE_FILE + ".leader" # Lo tiene bloqueado el proceso que ejecuta la caducidad
+LEADER_RETRY_SECONDS = 10 # Cada cuanto intenta un seguidor quedarse con el liderazgo
+STOP_POLL_SECONDS = 1 # Espera maxima entre comprobaciones de parada cuando el motor corre en un hilo
+SHARD_PROBE_TIMEOUT_SECONDS = 2.0 # Un volumen que tarda mas en responder se da por lento/no disponible
+SHARD_PROBE_CACHE_SECONDS = 30 # Tras un sondeo correcto no se vuelve a sondear ese volumen hasta pasado esto
+SHARD_BACKOFF_MIN_SECONDS = 30 # Espera tras el primer fallo; se dobla en cada fallo seguido
+SHARD_BACKOFF_MAX_SECONDS = 900
+SCANDIR_MIN_PATHS = 8 # Con menos paths en una carpeta sale mas barato un stat por path que listarla
+METRICS_SNAPSHOT_SECONDS = 60 # Cada cuanto vuelca el lider sus metricas a tempodel_metrics.json
+# Politica de espacio libre: con TEMPODEL_MIN_FREE ("10%" o "20G") y un volumen por debajo, los items
+# no periodicos de ese volumen se borran antes de su fecha, en orden de delete_at, hasta recuperarlo
+MIN_FREE = os.environ.get("TEMPODEL_MIN_FREE", "").strip()
+PRESSURE_CHECK_SECONDS = 60 # Cada cuanto se mira el espacio libre y los topes de carpetas periodicas
+PRESSURE_MARGIN = 0.02 # Se libera hasta el umbral + este % del disco, para no rozarlo en cada pasada
+SIZE_REFRESH_SECONDS = 3600 # Validez de un tamaño medido (las carpetas no se vuelven a recorrer antes)
+SIZE_SCAN_BUDGET_SECONDS = 2.0 # Tiempo maximo midiendo tamaños por pasada; el resto en las siguientes
+# Carpetas (no periodicas) retiradas con un rename y borradas en segundo plano; el journal permite retomarlas
+TOMBSTONE_JOURNAL_FILE = os.path.join(DATA_DIR, "tombstones.journal")
+TOMBSTONE_RETRY_MIN_SECONDS = 60 # Espera tras un borrado incompleto (archivos en uso); se dobla en cada intento
+TOMBSTONE_RETRY_MAX_SECONDS = 3600
+TOMBSTONE_JOURNAL_COMPACT_BYTES = 64 * 1024
+
+# --- Deteccion de cambios en schedule.json ---
+class _InotifyWaiter:
+    # Linux: inotify sobre el directorio del schedule
+    _MASK = 0x2 | 0x8 | 0x80 | 0x100 | 0x200 # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1 fallo")
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), self._MASK) < 0:
+            errno_value = ctypes.get_errno(); os.close(self._fd)
+            raise OSError(errno_value, "inotify_add_watch fallo")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not ready: return False
+        try:
+            while os.read(self._fd, 65536): pass
+        except BlockingIOError: pass
+        return True
+
+    def close(self): os.close(self._fd)
+
+class _WindowsChangeWaiter:
+    # Windows: FindFirstChangeNotificationW sobre el directorio del schedule
+    _FILTER = 0x1 | 0x8 | 0x10 # FILE_NOTIFY_CHANGE_FILE_NAME | SIZE | LAST_WRITE
+
+    def __init__(self, directory):
+        self._k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._k32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self._k32.FindFirstChangeNotificationW.argtypes = [ctypes.c_wchar_p, ctypes.c_int, ctypes.c_uint32]
+        self._k32.FindNextChangeNotification.argtypes = [ctypes.c_void_p]
+        self._k32.FindCloseChangeNotification.argtypes = [ctypes.c_void_p]
+        self._k32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        self._k32.WaitForSingleObject.restype = ctypes.c_uint32
+        self._handle = self._k32.FindFirstChangeNotificationW(directory, False, self._FILTER)
+        if self._handle in (None, ctypes.c_void_p(-1).value): raise ctypes.WinError(ctypes.get_last_error())
+
+    def wait(self, timeout):
+        result = self._k32.WaitForSingleObject(self._handle, int(min(max(timeout, 0), 86400) * 1000))
+        if result != 0: return False # WAIT_TIMEOUT u otro
+        self._k32.FindNextChangeNotification(self._handle)
+        return True
+
+    def close(self): self._k32.FindCloseChangeNotification(self._handle)
+
+class ScheduleWatcher:
+    # Detecta cambios en el schedule sin reparsearlo: firma (mtime, tamaño, inodo) de sus ficheros + contador de generacion.
+    # Si el sistema lo permite espera notificaciones nativas del directorio; si no, sondea la firma.
+    def __init__(self, files=None):
+        self.files = files or watched_files()
+        self._signature = None
+        self._waiter = None
+        directory = os.path.dirname(self.files[0])
+        try:
+            if sys.platform == "win32": self._waiter = _WindowsChangeWaiter(directory)
+            elif sys.platform.startswith("linux"): self._waiter = _InotifyWaiter(directory)
+        except Exception as e:
+            log_message(f"INFO: Notificaciones de cambios no disponibles ({e}). Sondeando cada {CHECK_INTERVAL_SECONDS_INTERNAL}s.")
+
+    def _current_signature(self):
+        signature = []
+        for path in self.files:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError: signature.append(None)
+        signature.append(read_generation())
+        return tuple(signature)
+
+    def changed(self):
+        # True si el schedule cambio desde la ultima llamada (o desde mark_seen)
+        signature = self._current_signature()
+        if signature == self._signature: return False
+        self._signature = signature
+        return True
+
+    def wait(self, timeout):
+        # Bloquea hasta que el schedule cambie o pase 'timeout'. No consume el cambio.
+        deadline = time.time() + max(timeout, 0)
+        while self._current_signature() == self._signature:
+            remaining = deadline - time.time()
+            if remaining <= 0: return False
+            if self._waiter is not None:
+                try: self._waiter.wait(remaining); continue
+                except Exception as e:
+                    log_message(f"WARN: Fallo esperando notificaciones ({e}). Se pasa a sondeo.")
+                    self._waiter = None
+            time.sleep(min(remaining, CHECK_INTERVAL_SECONDS_INTERNAL))
+        return True
+
+    def close(self):
+        if self._waiter is not None:
+            try: self._waiter.close()
+            except Exception: pass
+            self._waiter = None
+
+class DueScheduler:
+    # Planificador en memoria: min-heap de (delete_at, seq, path) con invalidacion perezosa.
+    # Solo se tocan los items caducados; los cambios del schedule se aplican incrementalmente.
+    def __init__(self):
+        self.items = {} # path normalizado -> (ScheduleItem, seq)
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self): return len(self.items)
+
+    def upsert(self, item):
+        self._seq += 1
+        self.items[item.path] = (item, self._seq)
+        heapq.heappush(self._heap, (item.delete_at, self._seq, item.path))
+
+    def defer(self, item, until):
+        # Vuelve al heap, pero no sale como 'due' hasta 'until' (volumen no disponible)
+        self._seq += 1
+        self.items[item.path] = (item, self._seq)
+        heapq.heappush(self._heap, (max(item.delete_at, until), self._seq, item.path))
+
+    def remove(self, path):
+        self.items.pop(os.path.normpath(path), None)
+
+    def iter_items(self):
+        return [(path, item) for path, (item, _) in self.items.items()]
+
+    def get(self, path):
+        entry = self.items.get(os.path.normpath(path))
+        return entry[0] if entry else None
+
+    def sync(self, schedule):
+        # Compara el schedule cargado con el estado en memoria y aplica solo las diferencias
+        seen = set(); changed = 0
+        for item in schedule:
+            path = item.path
+            seen.add(path)
+            entry = self.items.get(path)
+            if entry is None or entry[0] != item:
+                self.upsert(item); changed += 1
+        for path in [p for p in self.items if p not in seen]:
+            self.remove(path); changed += 1
+        self._compact_heap()
+        return changed
+
+    def sync_paths(self, items, paths):
+        # Aplica solo los paths que cambiaron en el journal
+        for path in paths:
+            item = items.get(path)
+            entry = self.items.get(path)
+            if item is None: self.remove(path)
+            elif entry is None or entry[0] != item: self.upsert(item)
+        self._compact_heap()
+
+    def _compact_heap(self):
+        if len(self._heap) > 2 * len(self.items) + 64: # Demasiadas entradas obsoletas en el heap
+            self._heap = [(it.delete_at, seq, p) for p, (it, seq) in self.items.items()]
+            heapq.heapify(self._heap)
+
+    def next_due_time(self):
+        while self._heap:
+            delete_at, seq, path = self._heap[0]
+            entry = self.items.get(path)
+            if entry is None or entry[1] != seq:
+                heapq.heappop(self._heap); continue
+            return delete_at
+        return None
+
+    def pop_due(self, now, limit=None):
+        due = []
+        while limit is None or len(due) < limit:
+            next_time = self.next_due_time()
+            if next_time is None or next_time > now: break
+            _, _, path = heapq.heappop(self._heap)
+            due.append(self.items[path][0])
+        return due
+
+    def count_due(self, now):
+        # Recorre solo la parte del heap con delete_at <= now (los hijos nunca son menores que el padre)
+        count = 0; pending = [0] if self._heap else []
+        while pending:
+            index = pending.pop()
+            delete_at, seq, path = self._heap[index]
+            if delete_at > now: continue
+            entry = self.items.get(path)
+            if entry is not None and entry[1] == seq: count += 1
+            pending.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(self._heap))
+        return count
+
+def _progress_logger(path):
+    return lambda files, dirs: log_message(f"INFO: Borrando '{path}': {files} archivos y {dirs} carpetas eliminados hasta ahora...")
+
+def process_due_item(item, on_error=None, exists=None, bury=True):
+    # Procesa un item caducado. Devuelve el item reprogramado (periodico) o None si debe salir del schedule.
+    # on_error(path, error) se llama con cada fallo de borrado (la GUI lo muestra en un dialogo).
+    # exists: resultado ya conocido (ExistenceCache del lote) para no repetir el stat; None lo comprueba aqui.
+    # bury=False borra las carpetas en el momento en lugar de retirarlas a un tombstone (el rename no libera espacio).
+    if item.rule is not None: return process_rule_item(item, on_error)
+    # El ScheduleItem ya viene normalizado (path, delete_at y duracion se validan al cargarlo)
+    path_to_process = item.path
+    is_dir = item.is_dir
+    delete_time = item.delete_at
+    is_periodic = item.periodic
+    original_duration = item.duration
+
+    # Detalle por item solo con TEMPODEL_LOG_LEVEL=DEBUG; el resultado (SUCCESS/ERROR) se registra siempre
+    log_message(f"DEBUG: Tiempo cumplido para: '{path_to_process}' (Programado: {datetime.datetime.fromtimestamp(delete_time)}, "
+                f"periodico: {is_periodic}, duracion original: {original_duration} s)")
+
+    if not (os.path.exists(path_to_process) if exists is None else exists):
+        return _vanished(path_to_process, is_periodic)
+
+    if is_periodic and original_duration is None:
+        log_message(f"ERROR: Item periodico '{path_to_process}' no tiene 'original_duration_seconds' valida. No se puede reprogramar. Se tratara como no periodico.")
+        is_periodic = False
+
+    try:
+        if item.periodic and is_dir:
+            log_message(f"INFO: Procesando CARPETA PERIODICA: {path_to_process}. Eliminando contenido.")
+            stats = remove_tree(path_to_process, keep_root=True, progress=_progress_logger(path_to_process))
+            _count_removed(stats)
+            for error_path, e_content in stats.errors:
+                log_message(f"ERROR: BORRANDO CONTENIDO '{error_path}' de '{path_to_process}': {e_content}")
+                if on_error is not None: on_error(error_path, e_content)
+            log_message(f"INFO: {stats.files} archivos y {stats.dirs} carpetas eliminados del contenido de '{path_to_process}'.")
+        elif (bury and is_dir and not os.path.islink(path_to_process) and _tombstones.running
+              and _tombstones.bury(path_to_process, _size_index.size(path_to_process))):
+            # Desaparece ya con un rename; el contenido se borra en segundo plano (y se retoma si se corta)
+            log_message(f"SUCCESS: Carpeta retirada: {path_to_process}. Su contenido se borra en segundo plano.")
+        elif is_dir:
+            log_message(f"DEBUG: Intentando borrar CARPETA (no periodica): {path_to_process}")
+            stats = remove_tree(path_to_process, progress=_progress_logger(path_to_process))
+            _count_removed(stats)
+            if stats.errors:
+                for error_path, e_content in stats.errors[:20]:
+                    log_message(f"ERROR: BORRANDO '{error_path}': {e_content}")
+                error = OSError(f"{len(stats.errors)} errores borrando el arbol ({stats.files} archivos y {stats.dirs} carpetas si se borraron)")
+                if on_error is not None: on_error(path_to_process, error)
+                # Lo que queda (archivos en uso) no se abandona: lo reintenta el reaper con backoff o, sin el, el schedule
+                size = _size_index.size(path_to_process)
+                remaining = max(size - stats.bytes, 0) if size is not None else None
+                if _tombstones.running and _tombstones.adopt(path_to_process, stats, remaining): return None
+                item = item.rescheduled(time.time() + TOMBSTONE_RETRY_MIN_SECONDS)
+                log_message(f"WARN: Borrado de '{path_to_process}' incompleto. Se reintentara el {datetime.datetime.fromtimestamp(item.delete_at)}.")
+                return item
+            log_message(f"SUCCESS: Carpeta borrada: {path_to_process} ({stats.files} archivos, {stats.dirs} carpetas)")
+        else:
+            log_message(f"DEBUG: Intentando borrar ARCHIVO ({'periodico' if is_periodic else 'no periodico'}): {path_to_process}")
+            os.remove(path_to_process)
+            metrics.inc("files_deleted")
+            size = _size_index.size(path_to_process) # Solo si ya estaba medido: sin un stat extra por archivo
+            if size: metrics.inc("bytes_deleted", size)
+            log_message(f"SUCCESS: Archivo borrado: {path_to_process}")
+    except FileNotFoundError as e:
+        if e.filename is None or os.path.normpath(e.filename) == path_to_process: # Desaparecio tras comprobarlo
+            return _vanished(path_to_process, is_periodic)
+        log_message(f"ERROR: BORRANDO '{path_to_process}': {e}")
+        if on_error is not None: on_error(path_to_process, e)
+        return None
+    except OSError as e:
+        log_message(f"ERROR: BORRANDO '{path_to_process}': {e}")
+        if not is_dir: metrics.inc("delete_errors") # Los de arbol ya se contaron en _count_removed
+        if is_periodic: log_message(f"WARN: Item periodico '{path_to_process}' tuvo un error durante el borrado/procesamiento. No se reprogramara ni mantendra.")
+        if on_error is not None: on_error(path_to_process, e)
+        return None # Si hay error, el item sale del schedule
+    except Exception as e:
+        log_message(f"ERROR: INESPERADO procesando '{path_to_process}': {e}\n{traceback.format_exc()}")
+        metrics.inc("delete_errors")
+        if on_error is not None: on_error(path_to_process, e)
+        return None
+
+    if not is_periodic:
+        return None
+    item = item.rescheduled(time.time() + original_duration)
+    metrics.inc("items_rescheduled")
+    log_message(f"SUCCESS: '{path_to_process}' reprogramado para {datetime.datetime.fromtimestamp(item.delete_at)}.")
+    return item
+
+def _vanished(path_to_process, is_periodic):
+    log_message(f"INFO: Elemento '{path_to_process}' ya no existia.")
+    if is_periodic:
+        # Si es periódico y no existe, no lo reprogramamos, se elimina del schedule.
+        log_message(f"INFO: Elemento periodico '{path_to_process}' no encontrado. Se eliminara del schedule.")
+    return None
+
+def _count_removed(stats):
+    # Lo que un borrado de arbol/regla llego a quitar, aunque despues haya errores
+    metrics.inc("files_deleted", stats.files); metrics.inc("dirs_deleted", stats.dirs)
+    if stats.bytes: metrics.inc("bytes_deleted", stats.bytes)
+    if stats.errors: metrics.inc("delete_errors", len(stats.errors))
+
+def process_rule_item(item, on_error=None):
+    # Regla de retencion: se expande ahora, recorriendo la carpeta, y se reprograma para la siguiente pasada.
+    # La regla sigue en el schedule aunque la carpeta no exista o haya errores (p.ej. una cache que se recrea).
+    rule = item.rule
+    try:
+        root, pattern = rule['root'], rule['pattern']
+        older_than = float(rule['older_than']); age_field = rule.get('age', 'mtime')
+        if age_field not in ('mtime', 'atime'): raise ValueError(f"campo de antigüedad {age_field!r}")
+    except (KeyError, TypeError, ValueError) as e:
+        log_message(f"ERROR: Regla '{item.path}' invalida ({e}). Se elimina del schedule.")
+        return None
+    log_message(f"INFO: Evaluando regla '{item.path}' (archivos con {age_field} de hace mas de {older_than / 86400:g} dias).")
+    if not os.path.isdir(root):
+        log_message(f"INFO: Carpeta de la regla '{root}' no encontrada. Se reintentara en la siguiente pasada.")
+    else:
+        try:
+            stats = remove_matching(root, pattern, older_than, age_field, rule.get('recursive', True), progress=_progress_logger(root))
+            _count_removed(stats)
+            metrics.inc("rule_entries_scanned", stats.scanned)
+            for error_path, e_content in stats.errors[:20]:
+                log_message(f"ERROR: BORRANDO '{error_path}' (regla '{item.path}'): {e_content}")
+            if on_error is not None and stats.errors:
+                # Una sola llamada por pasada: un patron con muchos archivos bloqueados no abre un dialogo por archivo
+                if len(stats.errors) == 1: on_error(*stats.errors[0])
+                else:
+                    first_path, first_error = stats.errors[0]
+                    on_error(item.path, OSError(f"{len(stats.errors)} archivos no se pudieron borrar (el primero, '{first_path}': {first_error})"))
+            log_message(f"SUCCESS: Regla '{item.path}': {stats.files} archivos borrados de {stats.scanned} entradas examinadas"
+                        f"{f', {len(stats.errors)} errores' if stats.errors else ''}.")
+        except OSError as e:
+            log_message(f"ERROR: Recorriendo '{root}' (regla '{item.path}'): {e}")
+            if on_error is not None: on_error(root, e)
+    interval = item.duration or 86400 # make_rule_item siempre pone el intervalo
+    item = item.rescheduled(time.time() + interval)
+    log_message(f"INFO: Siguiente pasada de la regla '{item.path}': {datetime.datetime.fromtimestamp(item.delete_at)}.")
+    return item
+
+# --- Disponibilidad de volumenes ---
+class ShardHealth:
+    # Antes de tocar los items de un shard (volumen o raiz configurada) se sondea su raiz en un hilo
+    # aparte con timeout: un recurso de red caido no bloquea la caducidad del resto. Mientras falla
+    # se reintenta con backoff exponencial, y sus items esperan en lugar de darse por desaparecidos.
+    def __init__(self):
+        self._ok_until = {} # key -> monotonic hasta el que se da por bueno el ultimo sondeo
+        self._retry_at = {} # key -> monotonic del siguiente sondeo tras un fallo
+        self._backoff = {}
+        self._probes = {} # key -> (hilo, resultado) de sondeos aun en curso
+
+    def _start_probe(self, key):
+        if key in self._probes: return # El sondeo anterior sigue colgado: no lanzar otro
+        result = {}
+        def probe():
+            result['ok'] = os.path.isdir(shard_root(key))
+        thread = threading.Thread(target=probe, name="tempodel-sondeo", daemon=True)
+        thread.start()
+        self._probes[key] = (thread, result)
+
+    def _finish_probe(self, key, deadline):
+        thread, result = self._probes[key]
+        thread.join(max(deadline - time.monotonic(), 0))
+        if not thread.is_alive(): del self._probes[key]
+        now = time.monotonic()
+        if result.get('ok'):
+            if key in self._backoff: log_message(f"INFO: Volumen '{key}' disponible de nuevo.")
+            self._backoff.pop(key, None); self._retry_at.pop(key, None)
+            self._ok_until[key] = now + SHARD_PROBE_CACHE_SECONDS
+            return True
+        backoff = min(self._backoff.get(key, SHARD_BACKOFF_MIN_SECONDS / 2) * 2, SHARD_BACKOFF_MAX_SECONDS)
+        reason = "no responde" if thread.is_alive() else "no disponible"
+        log_message(f"WARN: Volumen '{key}' {reason}; sus items se omiten y se reintenta en {backoff:.0f}s.")
+        self._backoff[key] = backoff; self._retry_at[key] = now + backoff
+        self._ok_until.pop(key, None)
+        return False
+
+    def check(self, keys):
+        # Devuelve el set de keys disponibles. Los sondeos necesarios se lanzan a la vez.
+        now = time.monotonic()
+        available = set(); to_probe = []
+        for key in keys:
+            if self._ok_until.get(key, 0) > now: available.add(key)
+            elif self._retry_at.get(key, 0) <= now: to_probe.append(key)
+        for key in to_probe: self._start_probe(key)
+        deadline = time.monotonic() + SHARD_PROBE_TIMEOUT_SECONDS
+        available.update(key for key in to_probe if self._finish_probe(key, deadline))
+        return available
+
+    def retry_time(self, key):
+        # Momento (time.time) del siguiente sondeo de un shard no disponible
+        return time.time() + max(self._retry_at.get(key, 0) - time.monotonic(), 0)
+
+_shard_health = ShardHealth()
+
+def split_by_availability(items):
+    # (items de shards accesibles, {key: [items]} de shards no disponibles)
+    by_shard = defaultdict(list)
+    for item in items: by_shard[shard_key(item.path)].append(item)
+    available = _shard_health.check(by_shard)
+    ready = [item for key in available for item in by_shard[key]]
+    return ready, {key: shard_items for key, shard_items in by_shard.items() if key not in available}
+
+# --- Comprobaciones de existencia agrupadas ---
+class ExistenceCache:
+    # Existencia de muchos paths con un os.scandir por carpeta padre en lugar de un stat por path.
+    # Los listados se guardan mientras viva el objeto: se crea uno por pasada (lote o barrido).
+    def __init__(self, min_paths=SCANDIR_MIN_PATHS):
+        self.min_paths = min_paths
+        self._listings = {} # carpeta (normcase) -> (nombres, enlaces) o None si no se pudo listar
+        self.listed = 0; self.stats = 0
+
+    def _listing(self, parent):
+        key = os.path.normcase(parent)
+        if key not in self._listings:
+            names = set(); links = set()
+            try:
+                with os.scandir(parent) as entries:
+                    for entry in entries:
+                        name = os.path.normcase(entry.name)
+                        names.add(name)
+                        if entry.is_symlink(): links.add(name)
+                self._listings[key] = (names, links)
+            except (FileNotFoundError, NotADirectoryError): self._listings[key] = (names, links) # Carpeta desaparecida
+            except OSError: self._listings[key] = None # Sin permiso para listar: stat por path
+            self.listed += 1
+        return self._listings[key]
+
+    def _stat(self, path):
+        self.stats += 1
+        return os.path.exists(path)
+
+    def existing(self, paths):
+        # Set de los paths de 'paths' que existen
+        by_parent = defaultdict(list)
+        for path in paths: by_parent[os.path.dirname(path)].append(path)
+        found = set()
+        for parent, children in by_parent.items():
+            sparse = len(children) < self.min_paths and os.path.normcase(parent) not in self._listings
+            listing = None if sparse else self._listing(parent)
+            for path in children:
+                name = os.path.normcase(os.path.basename(path))
+                if listing is None or not name: exists = self._stat(path) # Carpeta poco poblada, o raiz de unidad
+                elif name in listing[1]: exists = self._stat(path) # Enlace: exists() da False si esta roto
+                else: exists = name in listing[0]
+                if exists: found.add(path)
+        return found
+
+# --- Tamaño de los items programados ---
+class SizeIndex:
+    # path -> (bytes, dispositivo, medido en time.monotonic()). Cada item se mide una vez y la medida vale
+    # SIZE_REFRESH_SECONDS; los items que se procesan o salen del schedule se descartan. Las carpetas se
+    # recorren a trozos (TreeSizeWalk) dentro del presupuesto de cada pasada: una carpeta enorme o lenta
+    # avanza un poco en cada una sin frenar la caducidad, y mientras tanto vale su medida anterior.
+    def __init__(self, refresh_seconds=SIZE_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._entries = {}
+        self._walks = {} # path -> (TreeSizeWalk en curso, dispositivo)
+        self.walks = 0
+
+    def discard(self, path):
+        self._entries.pop(path, None)
+        walk = self._walks.pop(path, None)
+        if walk is not None: walk[0].close()
+
+    def size(self, path):
+        entry = self._entries.get(path)
+        return entry[0] if entry is not None else None
+
+    def device(self, path):
+        entry = self._entries.get(path)
+        return entry[1] if entry is not None else None
+
+    def total(self): return sum(entry[0] for entry in self._entries.values())
+
+    def measure(self, items, budget_seconds=SIZE_SCAN_BUDGET_SECONDS):
+        # Mide los items sin medida (o caducada), primero los que antes vencen, hasta agotar el presupuesto.
+        # Devuelve cuantos quedan pendientes para la siguiente pasada.
+        live = {item.path for item in items}
+        for path in [p for p in set(self._entries) | set(self._walks) if p not in live]: self.discard(path)
+        now = time.monotonic(); deadline = now + budget_seconds
+        # Primero los recorridos a medias, luego los que no tienen medida y al final los caducados
+        stale = sorted((item for item in items if item.path in self._walks or item.path not in self._entries
+                        or now - self._entries[item.path][2] >= self.refresh_seconds),
+                       key=lambda item: (item.path not in self._walks, item.path in self._entries, item.delete_at))
+        for done, item in enumerate(stale):
+            if time.monotonic() >= deadline or not self._measure(item.path, deadline): return len(stale) - done
+        return 0
+
+    def _measure(self, path, deadline):
+        # False si se acabo el presupuesto con el recorrido de la carpeta a medias
+        walk = self._walks.get(path)
+        if walk is None:
+            try: path_stat = os.lstat(path)
+            except OSError:
+                self._entries.pop(path, None); return True # Desaparecido o inaccesible: no cuenta
+            if not stat.S_ISDIR(path_stat.st_mode):
+                self._entries[path] = (path_stat.st_size, path_stat.st_dev, time.monotonic()); return True
+            walk = self._walks[path] = (TreeSizeWalk(path), path_stat.st_dev)
+        if not walk[0].step(deadline): return False
+        del self._walks[path]; self.walks += 1
+        self._entries[path] = (walk[0].stats.bytes, walk[1], time.monotonic())
+        return True
+
+_size_index = SizeIndex()
+
+# --- Borrado en paralelo ---
+def volume_key(path, devices=None):
+    # Volumen al que pertenece un path: su shard (unidad/recurso UNC en Windows o raiz configurada) o, en el
+    # shard por defecto de POSIX, el dispositivo de la carpeta padre con un stat por carpeta, no por item
+    # ('devices' es la cache de la pasada: carpeta -> dispositivo)
+    key = shard_key(path)
+    if key != os.sep: return key
+    parent = os.path.dirname(path)
+    if devices is not None and parent in devices: return devices[parent]
+    try: device = os.stat(parent).st_dev
+    except OSError: device = key
+    if devices is not None: devices[parent] = device
+    return device
+
+class DeletionPool:
+    # Reparte los items caducados en un pool de hilos limitado, con un maximo de borrados
+    # simultaneos por volumen. Los items de otros volumenes no esperan detras de un rmtree lento.
+    def __init__(self, workers=DELETE_WORKERS, per_volume=VOLUME_CONCURRENCY):
+        self.workers = max(1, workers)
+        self.per_volume = max(1, per_volume)
+        self._executor = None
+        self._guard = threading.Lock()
+
+    def _get_executor(self):
+        with self._guard:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tempodel-borrado")
+            return self._executor
+
+    def run(self, items, process=None, deadline=None):
+        # Devuelve ([(item, resultado)] en orden de finalizacion, [items no empezados]).
+        # Pasado 'deadline' (time.monotonic) no se lanzan mas borrados; los que ya corren terminan.
+        process = process or process_due_item
+        executor = self._get_executor()
+        pending = defaultdict(deque); devices = {}
+        for item in items: pending[volume_key(item.path, devices)].append(item)
+        running = {}; active = defaultdict(int); results = []
+
+        def fill():
+            if deadline is not None and time.monotonic() >= deadline: return
+            for volume, queue in pending.items():
+                while queue and active[volume] < self.per_volume and len(running) < self.workers:
+                    item = queue.popleft()
+                    running[executor.submit(_safe_process, process, item)] = (item, volume)
+                    active[volume] += 1
+
+        fill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, volume = running.pop(future)
+                active[volume] -= 1
+                results.append((item, future.result()))
+            fill()
+        return results, [item for queue in pending.values() for item in queue]
+
+    def shutdown(self):
+        with self._guard:
+            if self._executor is not None: self._executor.shutdown(wait=True)
+            self._executor = None
+
+def _safe_process(process, item):
+    start = time.perf_counter()
+    try: return process(item)
+    except Exception as e:
+        log_message(f"ERROR: INESPERADO procesando '{item.path}': {e}\n{traceback.format_exc()}")
+        return None
+    finally:
+        metrics.observe("delete_item_seconds", time.perf_counter() - start)
+
+_deletion_pool = DeletionPool()
+
+# --- Borrado en segundo plano de carpetas retiradas (tombstones) ---
+class _ReaperStopped(Exception): pass
+
+class TombstoneReaper:
+    # La carpeta caducada se renombra a un tombstone junto a ella (desaparece al instante para el usuario y
+    # el item sale del schedule) y un hilo la borra despues. Cada paso queda en TOMBSTONE_JOURNAL_FILE
+    # (alta antes del rename, avance cada PROGRESS_EVERY entradas, fin), asi que tras un reinicio, un cierre
+    # o un archivo en uso el nuevo lider retoma los tombstones pendientes; remove_tree es idempotente.
+    def __init__(self, journal_file=TOMBSTONE_JOURNAL_FILE):
+        self.journal_file = journal_file
+        self._pending = {} # tombstone -> {"path", "files", "dirs", "retry_at", "backoff"}
+        self._guard = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self): return self._thread is not None
+
+    def _append(self, record, sync=False):
+        # Con _guard tomado: una linea a medias que dejo un corte se recorta antes de escribir
+        with open(self.journal_file, 'a+b') as f:
+            trim_torn_tail(f)
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+            if sync:
+                f.flush(); os.fsync(f.fileno())
+
+    def _load(self):
+        pending = {}
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: record = json.loads(line)
+                    except ValueError: continue # Ultima linea a medias tras un corte
+                    tombstone = record.get('tombstone')
+                    if record.get('op') == 'add':
+                        pending[tombstone] = {"path": record.get('path'), "files": 0, "dirs": 0, "bytes": record.get('bytes')}
+                    elif record.get('op') == 'progress' and tombstone in pending:
+                        pending[tombstone].update(files=record.get('files', 0), dirs=record.get('dirs', 0))
+                    elif record.get('op') == 'done': pending.pop(tombstone, None)
+        except OSError: pass
+        return pending
+
+    def _compact(self):
+        # Con _guard tomado: reescribe el journal con solo los pendientes
+        try:
+            if os.path.getsize(self.journal_file) < TOMBSTONE_JOURNAL_COMPACT_BYTES and self._pending: return
+        except OSError: return
+        temp_path = self.journal_file + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for tombstone, entry in self._pending.items():
+                f.write(json.dumps({"op": "add", "tombstone": tombstone, "path": entry["path"], "bytes": entry["bytes"]}, ensure_ascii=False) + "\n")
+                f.write(json.dumps({"op": "progress", "tombstone": tombstone, "files": entry["files"], "dirs": entry["dirs"]}) + "\n")
+        os.replace(temp_path, self.journal_file)
+
+    def start(self):
+        if self._thread is not None: return
+        self._stop.clear()
+        with self._guard:
+            self._pending = {}
+            for tombstone, entry in self._load().items():
+                try: device = os.lstat(tombstone).st_dev
+                except OSError: # Terminado justo antes de cortarse, o el rename nunca llego a hacerse
+                    self._append({"op": "done", "tombstone": tombstone}); continue
+                self._pending[tombstone] = dict(entry, device=device, retry_at=0, backoff=TOMBSTONE_RETRY_MIN_SECONDS)
+            metrics.set_gauge("tombstones_pending", len(self._pending))
+        if self._pending:
+            log_message(f"INFO: Retomando el borrado en segundo plano de {len(self._pending)} carpetas retiradas.")
+        self._thread = threading.Thread(target=self._run, name="tempodel-tombstones", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # El borrado en curso se corta en el siguiente aviso de progreso; el siguiente lider lo retoma
+        thread, self._thread = self._thread, None
+        if thread is None: return
+        self._stop.set(); self._wake.set()
+        thread.join(STOP_POLL_SECONDS * 5)
+
+    def bury(self, path, size=None):
+        # Retira la carpeta: devuelve el tombstone, o None si no se pudo (se borra entonces como siempre).
+        # size: bytes que ocupa (del SizeIndex, None si no estaba medida); cuentan como ocupados hasta borrarla.
+        tombstone = tombstone_path(path)
+        with self._guard:
+            try:
+                self._append({"op": "add", "tombstone": tombstone, "path": path, "bytes": size, "at": time.time()}, sync=True)
+            except OSError as e:
+                log_message(f"WARN: No se pudo escribir {self.journal_file} ({e}). Se borra '{path}' directamente.")
+                return None
+            try:
+                os.rename(path, tombstone)
+            except OSError as e:
+                log_message(f"INFO: No se pudo retirar '{path}' ({e}). Se borra directamente.")
+                try: self._append({"op": "done", "tombstone": tombstone})
+                except OSError: pass
+                return None
+            try: device = os.lstat(tombstone).st_dev
+            except OSError: device = None
+            self._pending[tombstone] = {"path": path, "files": 0, "dirs": 0, "bytes": size, "device": device,
+                                        "retry_at": 0, "backoff": TOMBSTONE_RETRY_MIN_SECONDS}
+            metrics.inc("tombstones_created"); metrics.set_gauge("tombstones_pending", len(self._pending))
+        self._wake.set()
+        return tombstone
+
+    def adopt(self, path, stats, size=None):
+        # Carpeta que no se pudo retirar y se quedo a medio borrar (p.ej. un archivo en uso): el reaper la
+        # reintenta en su sitio con backoff. False si no se pudo anotar en el journal.
+        with self._guard:
+            try: self._append({"op": "add", "tombstone": path, "path": path, "bytes": size, "at": time.time()}, sync=True)
+            except OSError as e:
+                log_message(f"WARN: No se pudo escribir {self.journal_file} ({e}).")
+                return False
+            try: device = os.lstat(path).st_dev
+            except OSError: device = None
+            self._pending[path] = {"path": path, "files": stats.files, "dirs": stats.dirs, "bytes": size, "device": device,
+                                   "retry_at": time.monotonic() + TOMBSTONE_RETRY_MIN_SECONDS, "backoff": TOMBSTONE_RETRY_MIN_SECONDS * 2}
+            metrics.set_gauge("tombstones_pending", len(self._pending))
+        log_message(f"WARN: Borrado de '{path}' incompleto ({len(stats.errors)} errores). Se reintentara en segundo plano en {TOMBSTONE_RETRY_MIN_SECONDS}s.")
+        self._wake.set()
+        return True
+
+    def pending_bytes(self):
+        # dispositivo -> bytes que aun ocupan sus tombstones (None si alguno no tiene tamaño conocido)
+        held = {}
+        with self._guard:
+            for entry in self._pending.values():
+                device = entry.get("device")
+                if device is None: continue
+                size = entry.get("bytes")
+                held[device] = None if size is None or held.get(device, 0) is None else held.get(device, 0) + size
+        return held
+
+    def _next(self):
+        # (tombstone, entrada) listo para borrar, o (None, segundos hasta el siguiente reintento)
+        with self._guard:
+            now = time.monotonic(); wait_seconds = None
+            for tombstone, entry in self._pending.items():
+                if entry["retry_at"] <= now: return tombstone, entry
+                delay = entry["retry_at"] - now
+                wait_seconds = delay if wait_seconds is None else min(wait_seconds, delay)
+            return None, wait_seconds
+
+    def _run(self):
+        while not self._stop.is_set():
+            tombstone, entry = self._next()
+            if tombstone is None:
+                self._wake.wait(entry); self._wake.clear(); continue
+            try: self._reap(tombstone, entry)
+            except _ReaperStopped: break
+            except Exception as e:
+                log_message(f"ERROR: INESPERADO borrando '{tombstone}': {e}\n{traceback.format_exc()}")
+                entry["retry_at"] = time.monotonic() + TOMBSTONE_RETRY_MAX_SECONDS
+
+    def _reap(self, tombstone, entry):
+        base_files, base_dirs = entry["files"], entry["dirs"]
+        def checkpoint(files, dirs):
+            entry.update(files=base_files + files, dirs=base_dirs + dirs)
+            with self._guard:
+                try: self._append({"op": "progress", "tombstone": tombstone, "files": entry["files"], "dirs": entry["dirs"]})
+                except OSError: pass
+            if self._stop.is_set(): raise _ReaperStopped() # Lo borrado hasta aqui ya consta en el journal
+            log_message(f"INFO: Borrando '{entry['path']}' en segundo plano: {entry['files']} archivos y {entry['dirs']} carpetas hasta ahora...")
+        with metrics.span("tombstone_reap"):
+            stats = remove_tree(tombstone, progress=checkpoint) if os.path.lexists(tombstone) else None
+        if stats is not None:
+            _count_removed(stats)
+            entry.update(files=base_files + stats.files, dirs=base_dirs + stats.dirs)
+        if stats is not None and stats.errors:
+            for error_path, e_content in stats.errors[:20]: log_message(f"ERROR: BORRANDO '{error_path}': {e_content}")
+            entry["retry_at"] = time.monotonic() + entry["backoff"]
+            log_message(f"WARN: Borrado de '{entry['path']}' incompleto ({len(stats.errors)} errores). Se reintentara en {entry['backoff']}s.")
+            entry["backoff"] = min(entry["backoff"] * 2, TOMBSTONE_RETRY_MAX_SECONDS)
+            return
+        with self._guard:
+            self._pending.pop(tombstone, None)
+            try:
+                self._append({"op": "done", "tombstone": tombstone})
+                self._compact()
+            except OSError as e: log_message(f"WARN: Actualizando {self.journal_file}: {e}")
+            metrics.inc("tombstones_completed"); metrics.set_gauge("tombstones_pending", len(self._pending))
+        log_message(f"SUCCESS: Carpeta borrada: {entry['path']} ({entry['files']} archivos, {entry['dirs']} carpetas)")
+
+_tombstones = TombstoneReaper()
+
+def delete_due_items(items, deadline=None, process=None):
+    return _deletion_pool.run(items, process=process, deadline=deadline)
+
+class BacklogMonitor:
+    # Ritmo de vaciado cuando hay mas items caducados de los que caben en un lote
+    def __init__(self):
+        self.started = None
+        self.processed = 0
+        self.batches = 0
+
+    def record_batch(self, batch_start, processed, remaining):
+        if self.started is None: self.started = batch_start
+        self.processed += processed; self.batches += 1
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.processed / elapsed
+        if remaining:
+            eta = f", ETA ~{remaining / rate:.0f}s" if rate > 0 else ""
+            log_message(f"INFO: Backlog: {processed} items en este lote, {rate:.1f} items/s; quedan {remaining} caducados{eta}.")
+            return
+        if self.batches > 1:
+            log_message(f"INFO: Backlog vaciado: {self.processed} items en {self.batches} lotes ({elapsed:.1f}s, {rate:.1f} items/s).")
+        self.started = None; self.processed = 0; self.batches = 0
+
+_backlog = BacklogMonitor()
+
+_unsaved_changes = {} # Cambios ya aplicados en memoria que no se pudieron guardar; se reintentan en cada pasada
+
+def apply_schedule_changes(changes):
+    # changes: path -> (delete_at procesado, item nuevo o None para quitarlo).
+    # Se escriben como registros condicionales del journal: si el usuario reprogramo el item
+    # mientras se borraba, su cambio se respeta. Si no se pueden guardar se conservan en
+    # _unsaved_changes (el scheduler en memoria ya los refleja) y se reintentan en la siguiente pasada.
+    pending = dict(_unsaved_changes); pending.update(changes)
+    if not pending: return True
+    records = []
+    for path, (processed_delete_at, new_item) in pending.items():
+        if new_item is None: records.append(remove_record(path, processed_delete_at))
+        else: records.append(reschedule_record(path, new_item.delete_at, processed_delete_at))
+    log_message(f"INFO: Actualizando schedule ({len(records)} cambios{f', {len(_unsaved_changes)} pendientes de antes' if _unsaved_changes else ''}).")
+    if append_records(records):
+        _unsaved_changes.clear()
+        return True
+    _unsaved_changes.update(changes)
+    metrics.inc("schedule_save_errors")
+    log_message(f"ERROR: No se pudo guardar el progreso del schedule ({len(_unsaved_changes)} cambios). Se reintentara en la siguiente pasada.")
+    return False
+
+def create_scheduler():
+    # Con el backend SQLite las consultas de 'due' van directamente contra el indice de la base de datos
+    if STORE_BACKEND == "sqlite":
+        import tempodel_sqlite
+        return tempodel_sqlite.SqliteDueScheduler(_unsaved_changes), tempodel_sqlite.SqliteReader()
+    return DueScheduler(), ScheduleReader()
+
+def sync_scheduler(scheduler, reader):
+    changed_paths = reader.refresh()
+    if changed_paths is None: scheduler.sync(reader.items.values())
+    else: scheduler.sync_paths(reader.items, changed_paths)
+
+def _apply_results(scheduler, results, not_started):
+    changes = {}
+    for item, new_item in results:
+        path = item.path
+        changes[path] = (item.delete_at, new_item)
+        _size_index.discard(path) # Su tamaño ha cambiado (o ya no esta)
+        if new_item is None: scheduler.remove(path)
+        else: scheduler.upsert(new_item)
+    for item in not_started: scheduler.upsert(item) # Vuelven al heap para el siguiente lote
+    return apply_schedule_changes(changes)
+
+def _record_backlog(scheduler, now):
+    # Gauges del backlog: caducados pendientes y cuanto lleva esperando el mas antiguo
+    next_due = scheduler.next_due_time()
+    metrics.set_gauge("backlog_due", scheduler.count_due(now) if next_due is not None and next_due <= now else 0)
+    metrics.set_gauge("oldest_due_age_seconds", max(now - next_due, 0) if next_due is not None else 0)
+    return next_due
+
+def check_and_delete(scheduler, process=None):
+    # Procesa unicamente los items cuyo delete_at ya ha pasado (el scheduler ya esta sincronizado).
+    # Devuelve el timestamp del siguiente item pendiente (o None).
+    if _unsaved_changes: apply_schedule_changes({}) # Progreso de pasadas anteriores que no se pudo guardar
+    now = time.time()
+    due_items = scheduler.pop_due(now, BATCH_MAX_ITEMS)
+    if not due_items:
+        return _record_backlog(scheduler, now)
+    with metrics.span("check_and_delete", due=len(due_items)) as span:
+        next_due = _check_and_delete_batch(scheduler, due_items, now, process, span)
+    return next_due
+
+def _check_and_delete_batch(scheduler, due_items, now, process, span):
+    metrics.inc("items_due", len(due_items))
+    # Los items de volumenes caidos o lentos esperan a que vuelvan (con backoff), sin bloquear al resto
+    due_items, unavailable = split_by_availability(due_items)
+    for key, shard_items in unavailable.items():
+        for item in shard_items: scheduler.defer(item, _shard_health.retry_time(key))
+        metrics.inc("items_deferred", len(shard_items))
+    if not due_items:
+        return _record_backlog(scheduler, now)
+
+    # Un lote como maximo por llamada: el progreso se guarda al final del lote y el bucle principal
+    # vuelve a mirar si hay cambios (altas de la GUI) antes de seguir con el siguiente.
+    batch_start = time.monotonic()
+    log_message(f"--- Procesando lote de {len(due_items)} items caducados (de {len(scheduler)} en schedule) ---")
+    # Los que ya no existen salen del schedule sin pasar por el pool (un listado por carpeta).
+    # Las reglas no son un path real: siempre van al pool.
+    existence = ExistenceCache()
+    existing = existence.existing([item.path for item in due_items if item.rule is None])
+    _count_existence(existence)
+    vanished = [item for item in due_items if item.rule is None and item.path not in existing]
+    metrics.inc("items_vanished", len(vanished))
+    for item in vanished: log_message(f"INFO: Elemento '{item.path}' ya no existia.")
+    due_items = [item for item in due_items if item.rule is not None or item.path in existing]
+    # La existencia ya la respondio la ExistenceCache: el proceso no vuelve a hacer un stat por item
+    process = process or process_due_item
+    results, not_started = delete_due_items(due_items, deadline=batch_start + BATCH_TIME_BUDGET_SECONDS,
+                                            process=lambda item: process(item, exists=True))
+    results = [(item, None) for item in vanished] + results
+    saved = _apply_results(scheduler, results, not_started) # Si falla, queda en _unsaved_changes y se reintenta
+    metrics.inc("items_processed", len(results))
+    span.update(processed=len(results), vanished=len(vanished), not_started=len(not_started), saved=saved)
+    _backlog.record_batch(batch_start, len(results), scheduler.count_due(now))
+    log_message("DEBUG: --- Finalizada comprobacion de schedule ---")
+    return _record_backlog(scheduler, time.time())
+
+def prune_missing(scheduler, context="barrido"):
+    # Quita del schedule los items no periodicos que ya no existen en disco (aunque no sean 'due').
+    # Se ejecuta al arrancar y cada PRUNE_INTERVAL_SECONDS, no en cada tick.
+    # Los items de volumenes no disponibles no se tocan: no estan desaparecidos, solo inaccesibles.
+    changes = {}
+    with metrics.span("prune", context=context) as span:
+        candidates, unavailable = split_by_availability([item for _, item in scheduler.iter_items() if not item.periodic])
+        if unavailable:
+            log_message(f"INFO ({context}): Se omiten {sum(map(len, unavailable.values()))} items de volumenes no disponibles.")
+        existence = ExistenceCache()
+        existing = existence.existing([item.path for item in candidates])
+        _count_existence(existence)
+        for item in candidates:
+            path = item.path
+            if path in existing: continue
+            log_message(f"INFO ({context}): Eliminando item no existente y no periódico: {path}")
+            changes[path] = (item.delete_at, None)
+            scheduler.remove(path)
+        apply_schedule_changes(changes)
+        metrics.inc("prune_items_scanned", len(candidates)); metrics.inc("prune_items_removed", len(changes))
+        span.update(scanned=len(candidates), removed=len(changes))
+    return len(changes)
+
+def _free_space_threshold(total_bytes):
+    # Bytes libres minimos segun TEMPODEL_MIN_FREE ("10%" o "20G"); None si la politica esta desactivada
+    if not MIN_FREE: return None
+    try:
+        if MIN_FREE.endswith("%"): return total_bytes * float(MIN_FREE[:-1]) / 100
+        return parse_size(MIN_FREE)
+    except ValueError:
+        return None
+
+def _enforce_size_caps(items):
+    # Carpetas periodicas con tope (max_bytes) que lo superan: se borran sus archivos mas antiguos
+    trimmed = 0
+    for item in items:
+        size = _size_index.size(item.path)
+        if size is None or size <= item.max_bytes: continue
+        log_message(f"INFO: Carpeta periodica '{item.path}' ocupa {format_size(size)} (tope {format_size(item.max_bytes)}). Borrando sus archivos mas antiguos.")
+        try: stats = trim_to_size(item.path, item.max_bytes, progress=_progress_logger(item.path))
+        except OSError as e:
+            log_message(f"ERROR: Aplicando el tope de tamaño a '{item.path}': {e}"); continue
+        _count_removed(stats)
+        for error_path, e_content in stats.errors[:20]: log_message(f"ERROR: BORRANDO '{error_path}' (tope de '{item.path}'): {e_content}")
+        log_message(f"SUCCESS: Tope de '{item.path}': {stats.files} archivos borrados ({format_size(stats.bytes)}).")
+        _size_index.discard(item.path); trimmed += 1
+    metrics.inc("size_cap_trims", trimmed)
+    return trimmed
+
+def _pressure_victims(items):
+    # Items a adelantar en cada volumen por debajo del umbral: los que antes vencen, hasta cubrir lo que falta
+    by_device = defaultdict(list)
+    for item in items:
+        device = _size_index.device(item.path)
+        if device is not None: by_device[device].append(item)
+    victims = []; held = _tombstones.pending_bytes()
+    for device, device_items in by_device.items():
+        try: usage = shutil.disk_usage(device_items[0].path)
+        except OSError: continue
+        threshold = _free_space_threshold(usage.total)
+        if threshold is None or usage.free >= threshold: continue
+        needed = threshold + PRESSURE_MARGIN * usage.total - usage.free; freed = 0; count = 0
+        # Lo que aun ocupan las carpetas retiradas se libera solo cuando el reaper las termine
+        if device in held:
+            if held[device] is None or held[device] >= needed:
+                log_message(f"INFO: Espacio libre bajo en el volumen de '{device_items[0].path}', pero aun se estan borrando carpetas "
+                            f"retiradas{f' ({format_size(held[device])})' if held[device] is not None else ''}. No se adelantan borrados.")
+                continue
+            needed -= held[device]
+        for item in sorted(device_items, key=lambda item: item.delete_at):
+            if freed >= needed: break
+            victims.append(item); freed += _size_index.size(item.path) or 0; count += 1
+        log_message(f"WARN: Espacio libre bajo en el volumen de '{device_items[0].path}': {format_size(usage.free)} libres "
+                    f"(minimo {format_size(threshold)}). Se adelanta el borrado de {count} items (~{format_size(freed)}).")
+    return victims
+
+def relieve_disk_pressure(scheduler, process=None):
+    # Politica de espacio: topes de carpetas periodicas y, con TEMPODEL_MIN_FREE, borrado adelantado
+    # cuando un volumen baja del umbral. Los tamaños salen del SizeIndex (medidos poco a poco).
+    # Devuelve cuantos items se adelantaron.
+    with metrics.span("disk_pressure") as span:
+        items = [item for _, item in scheduler.iter_items() if item.rule is None]
+        capped = [item for item in items if item.periodic and item.is_dir and item.max_bytes]
+        candidates = [item for item in items if not item.periodic] if MIN_FREE else []
+        if not capped and not candidates: return 0
+        ready, _ = split_by_availability(capped + candidates)
+        ready_paths = {item.path for item in ready}
+        pending = _size_index.measure(ready)
+        metrics.set_gauge("scheduled_bytes", _size_index.total()); metrics.set_gauge("size_index_pending", pending)
+        metrics.set_gauge("size_index_walks", _size_index.walks)
+        _enforce_size_caps([item for item in capped if item.path in ready_paths])
+        victims = _pressure_victims([item for item in candidates if item.path in ready_paths])
+        span.update(measure_pending=pending, victims=len(victims))
+        if not victims: return 0
+        # Borrado en el momento, sin tombstone: retirar la carpeta no libera espacio y la siguiente
+        # comprobacion veria el volumen igual de lleno y adelantaria mas items
+        process = process or process_due_item
+        results, not_started = delete_due_items(victims, deadline=time.monotonic() + BATCH_TIME_BUDGET_SECONDS,
+                                                process=lambda item: process(item, bury=False))
+        if not _apply_results(scheduler, results, not_started): # Queda en _unsaved_changes y se reintenta
+            span.update(saved=False)
+        metrics.inc("pressure_deletions", len(results))
+        return len(results)
+
+def _count_existence(existence):
+    metrics.inc("existence_listings", existence.listed); metrics.inc("existence_stats", existence.stats)
+
+
+def log_lock_stats():
+    stats = lock_stats()
+    if stats["contended"] or stats["timeouts"]:
+        log_message(f"INFO: Locks del schedule: {stats['acquisitions']} adquisiciones, {stats['contended']} con espera, "
+                    f"espera total {stats['total_wait_seconds']:.2f}s (max {stats['max_wait_seconds']:.2f}s), {stats['timeouts']} timeouts.")
+
+
+# --- Motor de caducidad con eleccion de lider ---
+class ExpiryEngine:
+    # Bucle comun de los dos puntos de entrada. Todos los procesos vigilan el schedule; solo el lider
+    # (lock exclusivo sobre LEADER_LOCK_FILE, mantenido mientras vive) borra, barre y compacta.
+    def __init__(self, name, on_change=None, on_error=None):
+        self.name = name
+        self.on_change = on_change # Llamado (desde el hilo del motor) cuando cambia el schedule
+        self.on_error = on_error # on_error(path, error) por cada fallo de borrado
+        self.is_leader = False
+        self.scheduler = None
+        self.reader = None
+        self.watcher = None
+        self._leader_lock = FileLock(LEADER_LOCK_FILE, tag="leader")
+        self._next_leader_attempt = 0
+        self._last_prune = 0
+        self._next_metrics_snapshot = 0
+        self._next_pressure_check = 0
+        self._stop_event = threading.Event()
+
+    def stop(self): self._stop_event.set()
+
+    def _try_become_leader(self):
+        self._next_leader_attempt = time.monotonic() + LEADER_RETRY_SECONDS
+        try:
+            if not self._leader_lock.try_acquire(): return False
+        except OSError as e:
+            log_message(f"WARN: No se pudo comprobar el lock de lider ({e}).")
+            return False
+        self.is_leader = True
+        log_message(f"INFO: {self.name} (PID: {os.getpid()}) es el lider: ejecuta la caducidad del schedule.")
+        self.scheduler, self.reader = create_scheduler()
+        sync_scheduler(self.scheduler, self.reader)
+        _tombstones.start() # Retoma las carpetas que quedaron a medio borrar
+        try:
+            if prune_missing(self.scheduler, "arranque"):
+                log_message("INFO (arranque): Schedule limpiado de items obsoletos no periódicos.")
+        except Exception as e_init_clean:
+            log_message(f"ERROR (arranque): No se pudo limpiar el schedule: {e_init_clean}")
+        self._last_prune = time.time()
+        return True
+
+    def _process(self, item, exists=None, bury=True):
+        return process_due_item(item, on_error=self.on_error, exists=exists, bury=bury)
+
+    def _notify(self):
+        if self.on_change is None: return
+        try: self.on_change()
+        except Exception as e: log_message(f"WARN: Fallo notificando cambios del schedule: {e}")
+
+    def step(self):
+        # Una vuelta del bucle. Devuelve cuantos segundos se puede esperar hasta la siguiente.
+        changed = self.watcher.changed()
+        if not self.is_leader and time.monotonic() >= self._next_leader_attempt:
+            self._try_become_leader()
+        if not self.is_leader:
+            if changed: self._notify()
+            return max(self._next_leader_attempt - time.monotonic(), 0)
+
+        metrics.inc("ticks")
+        with metrics.span("tick", changed=bool(changed)):
+            if changed:
+                with metrics.span("sync"): sync_scheduler(self.scheduler, self.reader)
+            next_due = check_and_delete(self.scheduler, process=self._process)
+            if time.time() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                prune_missing(self.scheduler)
+                maybe_compact()
+                log_lock_stats()
+                self._last_prune = time.time()
+            if time.monotonic() >= self._next_pressure_check:
+                relieve_disk_pressure(self.scheduler, process=self._process)
+                self._next_pressure_check = time.monotonic() + PRESSURE_CHECK_SECONDS
+        if changed: self._notify()
+        if time.monotonic() >= self._next_metrics_snapshot:
+            metrics.write_snapshot()
+            self._next_metrics_snapshot = time.monotonic() + METRICS_SNAPSHOT_SECONDS
+        # Esperar hasta el siguiente item caducado, el proximo barrido, volcado de metricas o control de espacio, o un cambio
+        wait_seconds = max(self._last_prune + PRUNE_INTERVAL_SECONDS - time.time(), 0)
+        wait_seconds = min(wait_seconds, max(min(self._next_metrics_snapshot, self._next_pressure_check) - time.monotonic(), 0))
+        if next_due is not None:
+            wait_seconds = min(wait_seconds, max(next_due - time.time(), 0))
+        return wait_seconds
+
+    def run(self, threaded=False):
+        # threaded: el motor corre en un hilo de otra aplicacion y debe atender stop() con rapidez
+        self.watcher = ScheduleWatcher()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    wait_seconds = self.step()
+                except Exception as e:
+                    # Un solo mensaje: si el fallo se repite en cada reintento, el log lo agrupa
+                    log_message(f"ERROR: CRITICO en el bucle principal de check_and_delete: {e}\nTraceback:\n{traceback.format_exc()}")
+                    wait_seconds = CHECK_INTERVAL_SECONDS_INTERNAL * 5
+                    if self._stop_event.wait(wait_seconds): break
+                    continue
+                if threaded: wait_seconds = min(wait_seconds, STOP_POLL_SECONDS)
+                self.watcher.wait(wait_seconds)
+        finally:
+            self.close()
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.close(); self.watcher = None
+        if self.is_leader:
+            _deletion_pool.shutdown()
+            _tombstones.stop()
+            metrics.write_snapshot()
+            self._leader_lock.release()
+            self.is_leader = False
+            log_message(f"INFO: {self.name} deja de ser el lider.")
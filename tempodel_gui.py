@@ -1,311 +1,214 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-import json
 import os
-import shutil
 import time
 import datetime
 import threading
+import queue
+import bisect
 import sys
-from pathlib import Path
-import tempfile
 import traceback
 
+from tempodel_store import ScheduleItem, load_items, add_items, remove_items
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-SCHEDULE_FILE = os.path.join(SCRIPT_DIR, "schedule.json")
 ICON_FILE = os.path.join(SCRIPT_DIR, "icon.ico")
-CHECK_INTERVAL_SECONDS = 60
 app = None
-checker_thread = None
-
-TEMP_DIR = tempfile.gettempdir()
-CONFIGURE_LOCK_FILE = os.path.join(TEMP_DIR, "tempodel_configure_multiselect.lock")
-PENDING_PATHS_FILE = os.path.join(TEMP_DIR, "tempodel_pending_paths_multiselect.txt")
-MULTI_SELECT_WAIT_MS = 600
-
-def load_schedule():
-    lock_file = SCHEDULE_FILE + ".lock"
-    schedule = []
-    try:
-        for _ in range(10):
-            if not os.path.exists(lock_file): break
-            time.sleep(0.2)
-        lock_created = False
-        if not os.path.exists(lock_file):
-            try:
-                with open(lock_file, 'w') as lf: lf.write(f"gui_load_{os.getpid()}")
-                lock_created = True
-            except IOError: pass
-        if os.path.exists(SCHEDULE_FILE):
-            try:
-                with open(SCHEDULE_FILE, 'r', encoding='utf-8') as f: loaded_data = json.load(f)
-                if isinstance(loaded_data, list):
-                     schedule = [item for item in loaded_data if isinstance(item, dict) and all(k in item for k in ('path', 'delete_at', 'is_dir'))]
-                     # DEBUG LOGGING:
-                     for i, item_debug in enumerate(schedule):
-                         if item_debug.get("periodic"):
-                             print(f"DEBUG LOAD (GUI): Item {i} ({item_debug.get('path')}) es periodico. original_duration_seconds: {item_debug.get('original_duration_seconds')}, Tipo: {type(item_debug.get('original_duration_seconds'))}")
-                     # FIN DEBUG
-                     if len(schedule) != len(loaded_data): print("WARN: Items malformados eliminados al cargar schedule.")
-                else:
-                    print("ERROR: schedule.json no contiene lista valida. Usando lista vacia.")
-                    schedule = []
-            except (json.JSONDecodeError, IOError, TypeError) as e:
-                print(f"ERROR: Cargando schedule ({SCHEDULE_FILE}): {e}. Creando/usando lista vacia.")
-                save_schedule([])
-                schedule = []
-        else: schedule = []
-    except Exception as e:
-        print(f"ERROR: Excepcion inesperada en load_schedule: {e}")
-        traceback.print_exc()
-        schedule = []
-    finally:
-        if lock_created and os.path.exists(lock_file):
-            try: os.remove(lock_file)
-            except OSError: pass
-    return schedule
-
-def save_schedule(schedule):
-    lock_file = SCHEDULE_FILE + ".lock"
-    try:
-        for _ in range(10):
-            if not os.path.exists(lock_file): break
-            time.sleep(0.2)
-        lock_created = False
-        if not os.path.exists(lock_file):
-             try:
-                 with open(lock_file, 'w') as lf: lf.write(f"gui_save_{os.getpid()}")
-                 lock_created = True
-             except IOError: pass
-        try:
-            valid_schedule = [item for item in schedule if isinstance(item, dict) and all(k in item for k in ('path', 'delete_at', 'is_dir')) and isinstance(item.get('path'), str)]
-            temp_schedule_path = SCHEDULE_FILE + ".tmp"
-            with open(temp_schedule_path, 'w', encoding='utf-8') as f: json.dump(valid_schedule, f, indent=4, ensure_ascii=False)
-            shutil.move(temp_schedule_path, SCHEDULE_FILE)
-        except (IOError, TypeError, OSError) as e:
-            print(f"ERROR: Guardando schedule ({SCHEDULE_FILE}): {e}")
-            if app and app.root.winfo_exists(): app.root.after(0, lambda: messagebox.showerror("Error", f"No se pudo guardar la lista: {e}"))
-            if os.path.exists(temp_schedule_path):
-                 try: os.remove(temp_schedule_path)
-                 except OSError: pass
-    except Exception as e:
-        print(f"ERROR: Excepcion inesperada en save_schedule: {e}")
-        traceback.print_exc()
-    finally:
-        if lock_created and os.path.exists(lock_file):
-             try: os.remove(lock_file)
-             except OSError: pass
-
-def add_item_to_schedule(item_path, delete_timestamp, is_periodic_item=False, duration_for_periodic=None):
-    # Determinar is_dir. Para paths no existentes, esto será False.
-    # La 'is_dir_hint' del diálogo de configuración es crucial si el path no existe y DEBE ser carpeta.
-    # Esta función actualmente no recibe ese hint explícito, confía en os.path.isdir().
-    # Esto es una limitación si se añade una carpeta periódica que aún no existe.
-    current_is_dir = os.path.isdir(item_path)
-
-    if not os.path.exists(item_path):
-        if not is_periodic_item: # Solo mostrar advertencia si no es periódico y no existe
-            print(f"WARN: Path no existe al añadir/actualizar item no periódico: {item_path}")
-            # No mostrar messagebox aquí, el diálogo ya terminó. El caller (_configure_items_dialog) podría.
-            # return False # No retornamos False aquí para permitir que items periódicos se añadan.
-        else:
-             print(f"INFO: Path para item periódico '{item_path}' no existe actualmente, pero se añadirá/actualizará.")
-    
-    schedule = load_schedule()
-    normalized_path = os.path.normpath(item_path)
-    
-    new_item_data = {
-        "path": normalized_path,
-        "delete_at": float(delete_timestamp),
-        "is_dir": current_is_dir, # Usar el estado actual. Si no existe, será False.
-        "periodic": is_periodic_item
-    }
-
-    if is_periodic_item:
-        if duration_for_periodic is not None and float(duration_for_periodic) > 0:
-            new_item_data["original_duration_seconds"] = float(duration_for_periodic)
-        else:
-            # Si es periódico pero no se da una duración válida, no tiene sentido. Lo hacemos no periódico.
-            print(f"WARN: Item '{item_path}' marcado como periodico pero sin original_duration_seconds valido ({duration_for_periodic}). Se tratara como no periodico.")
-            new_item_data["periodic"] = False
-            # No necesitamos explícitamente del new_item_data["original_duration_seconds"] aquí
-            # porque no se añadió si duration_for_periodic no era válido.
-    # Si no es periódico, nos aseguramos que "original_duration_seconds" no esté presente.
-    # Esto se maneja al construir new_item_data y al actualizar/reemplazar.
-
-    existing_item_index = -1
-    for i, item_s in enumerate(schedule):
-        if 'path' in item_s and os.path.normpath(item_s['path']) == normalized_path:
-            existing_item_index = i
-            break
-    
-    if existing_item_index != -1:
-        # Para actualizar, es más seguro reemplazar el diccionario completo o manejar las claves explícitamente.
-        # Si el item deja de ser periódico, 'original_duration_seconds' debe ser removido.
-        # Si se vuelve periódico, 'original_duration_seconds' debe ser añadido/actualizado.
-        
-        # schedule[existing_item_index] = new_item_data # Reemplazo directo
-        # O, si queremos ser más cuidadosos con .update():
-        if not new_item_data.get("periodic") and "original_duration_seconds" in schedule[existing_item_index]:
-            del schedule[existing_item_index]["original_duration_seconds"]
-        schedule[existing_item_index].update(new_item_data)
-
-        print(f"'{os.path.basename(normalized_path)}' actualizado. Periódico: {new_item_data['periodic']}. Nuevo borrado: {datetime.datetime.fromtimestamp(new_item_data['delete_at'])}")
-    else:
-        schedule.append(new_item_data)
-        print(f"'{os.path.basename(normalized_path)}' añadido. Periódico: {new_item_data['periodic']}. Borrado: {datetime.datetime.fromtimestamp(new_item_data['delete_at'])}")
-    
-    save_schedule(schedule)
-    return True
-
-
-def remove_item_from_schedule(item_path):
-    schedule = load_schedule()
-    normalized_path_to_remove = os.path.normpath(item_path)
-    new_schedule = [item for item in schedule if 'path' not in item or os.path.normpath(item['path']) != normalized_path_to_remove]
-    if len(schedule) != len(new_schedule):
-        save_schedule(new_schedule)
-        print(f"Eliminado de la lista: {normalized_path_to_remove}")
-        return True
-    else:
-        print(f"Intento de eliminar, pero no se encontro: {normalized_path_to_remove}")
-        return False
-
-# --- Lógica del Background Checker (GUI) ---
-# Esta es una copia de la lógica del checker autónomo, adaptada para la GUI
-def check_and_delete(): # Checker de la GUI
-    global SCHEDULE_FILE, CHECK_INTERVAL_SECONDS, app, checker_thread
-    if not (app and app.root.winfo_exists()): # Si la GUI ya no existe, el checker no debe correr
-        print("(GUI Checker) Abortando, la ventana principal no existe.")
-        return
-
-    print(f"{datetime.datetime.now()}: (GUI Checker) Comprobando schedule en {SCHEDULE_FILE}...")
-    
-    schedule = load_schedule() # Usa la función load_schedule global
-    current_time = time.time()
-    items_to_keep = []
-    items_processed_this_run = False
-    items_due_count = 0
-
-
-    for item_original in schedule:
-        item = item_original.copy()
-
-        if not all(k in item for k in ('path', 'delete_at', 'is_dir')): continue
-        
-        path_to_process = os.path.normpath(item['path'])
-        is_dir = item['is_dir'] # is_dir del schedule, podría ser stale si el tipo cambió
-        delete_time = item.get('delete_at', 0)
-        is_periodic = item.get('periodic', False)
-        original_duration = item.get('original_duration_seconds', None)
-        if original_duration is not None:
-            try:
-                original_duration = float(original_duration)
-                if original_duration <= 0: original_duration = None
-            except ValueError: original_duration = None
-        
-        processed_item_this_cycle = False
-
-        if current_time >= delete_time:
-            items_due_count += 1
-            items_processed_this_run = True
-            processed_item_this_cycle = True
-
-            print(f"(GUI Checker) Tiempo cumplido para: {path_to_process}")
-            print(f"              Is Periodic: {is_periodic}, Original Duration: {original_duration}s")
-
-            if not os.path.exists(path_to_process):
-                print(f"(GUI Checker) Elemento '{path_to_process}' ya no existia.")
-                if is_periodic:
-                    print(f"(GUI Checker) Elemento periodico '{path_to_process}' no encontrado. Se eliminara del schedule.")
-                continue
-
-            action_successful = False
-            try:
-                # Re-evaluar is_dir en el momento del borrado
-                current_is_dir_on_disk = os.path.isdir(path_to_process)
-
-                if is_periodic:
-                    if original_duration is None:
-                        print(f"(GUI Checker) ERROR: Item periodico '{path_to_process}' sin 'original_duration_seconds' valida. Tratado como no periodico.")
-                        is_periodic = False 
-                    
-                    if current_is_dir_on_disk: # Usar el estado actual del disco para 'is_dir'
-                        print(f"(GUI Checker) Procesando CARPETA PERIODICA: {path_to_process}. Eliminando contenido.")
-                        # ... (borrado de contenido, igual que en checker autónomo) ...
-                        for entry_name in os.listdir(path_to_process):
-                            entry_path = os.path.join(path_to_process, entry_name)
-                            try:
-                                if os.path.isfile(entry_path) or os.path.islink(entry_path): os.unlink(entry_path)
-                                elif os.path.isdir(entry_path): shutil.rmtree(entry_path)
-                            except Exception as e_content:
-                                print(f"(GUI Checker) ERROR borrando contenido '{entry_path}': {e_content}")
-                                if app and app.root.winfo_exists(): app.root.after(0, lambda p=entry_path, err=e_content: messagebox.showerror("Error Borrado Contenido", f"No se pudo borrar:\n{p}\n\nError: {err}", parent=app.root))
-                        action_successful = True
-                        
-                        if is_periodic:
-                            item['delete_at'] = time.time() + original_duration
-                            items_to_keep.append(item)
-                            print(f"(GUI Checker) Carpeta '{path_to_process}' (contenido) reprogramada para {datetime.datetime.fromtimestamp(item['delete_at'])}.")
-                    
-                    else: # Archivo periódico (o path que no es directorio)
-                        print(f"(GUI Checker) Intentando borrar ARCHIVO PERIODICO: {path_to_process}")
-                        os.remove(path_to_process)
-                        action_successful = True
-                        print(f"(GUI Checker) Archivo periodico borrado: {path_to_process}")
-                        if is_periodic:
-                            item['delete_at'] = time.time() + original_duration
-                            items_to_keep.append(item)
-                            print(f"(GUI Checker) Archivo '{path_to_process}' reprogramado para {datetime.datetime.fromtimestamp(item['delete_at'])}.")
-                
-                else: # No periódico
-                    if current_is_dir_on_disk:
-                        print(f"(GUI Checker) Intentando borrar CARPETA (no periodica): {path_to_process}")
-                        shutil.rmtree(path_to_process)
-                        action_successful = True
-                        print(f"(GUI Checker) Carpeta borrada: {path_to_process}")
-                    else:
-                        print(f"(GUI Checker) Intentando borrar ARCHIVO (no periodico): {path_to_process}")
-                        os.remove(path_to_process)
-                        action_successful = True
-                        print(f"(GUI Checker) Archivo borrado: {path_to_process}")
-
-            except OSError as e:
-                print(f"(GUI Checker) Error borrando {path_to_process}: {e}")
-                if app and app.root.winfo_exists(): app.root.after(0, lambda p=path_to_process, err=e: messagebox.showerror("Error de Borrado", f"No se pudo borrar:\n{p}\n\nError: {err}", parent=app.root))
+engine = None
+engine_thread = None
+
+single_instance_server = None
+MULTI_SELECT_DEBOUNCE_MS = 300 # El dialogo se abre cuando llevan este tiempo sin llegar rutas nuevas
+VIEW_BUFFER_ROWS = 50 # Filas materializadas por encima y por debajo de las visibles
+WORKER_CLOSE_TIMEOUT_SECONDS = 5 # Al cerrar, espera maxima para terminar escrituras pendientes
+
+class VirtualScheduleView:
+    # Lista virtual sobre un ttk.Treeview. El modelo completo (path -> item, ordenado por fecha) vive en
+    # Python; en el Treeview solo existen las filas visibles mas VIEW_BUFFER_ROWS por cada lado, con el
+    # path como iid. Cada refresco aplica un diff: solo se insertan, actualizan, mueven o borran las filas
+    # de la ventana que cambiaron, asi que el coste depende de lo que hay en pantalla y no del schedule.
+    def __init__(self, tree, scrollbar, formatter, buffer_rows=VIEW_BUFFER_ROWS):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.formatter = formatter # item -> tupla de columnas (solo se llama para filas materializadas)
+        self.buffer_rows = buffer_rows
+        self.items = {} # path -> item
+        self.order = [] # paths ordenados por (delete_at, path)
+        self.selected = set() # Seleccion por path: sobrevive a los cambios de ventana
+        self.top = 0 # Indice en order de la primera fila visible
+        self.window = (0, 0) # Rango [inicio, fin) de order materializado en el Treeview
+        self._shown = {} # path -> valores actualmente en el Treeview
+        self._sort_keys = {}
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.bind('<Configure>', lambda e: self._render())
+        tree.bind('<ButtonPress-1>', self._on_click, add='+')
+        tree.bind('<<TreeviewSelect>>', self._on_select, add='+')
+
+    def visible_rows(self):
+        try: row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except (ValueError, tk.TclError): row_height = 20
+        return max(int(self.tree.cget('height')), self.tree.winfo_height() // row_height, 1)
+
+    @staticmethod
+    def _sort_key(path, item):
+        return (item.delete_at, path)
+
+    @staticmethod
+    def build_model(items):
+        # Parte cara del refresco (ordenar); no toca Tk, se puede llamar desde otro hilo.
+        # Los ScheduleItem ya llegan validados y con el path normalizado.
+        new_items = {item.path: item for item in items}
+        sort_keys = {path: VirtualScheduleView._sort_key(path, item) for path, item in new_items.items()}
+        return new_items, sort_keys, sorted(sort_keys, key=sort_keys.__getitem__)
+
+    def set_items(self, items):
+        self.set_model(self.build_model(items))
+
+    def set_model(self, model):
+        # Sustituye el modelo (de build_model) y refresca la ventana por diff
+        self.items, self._sort_keys, self.order = model
+        self.selected &= self.items.keys()
+        self._render(force=True)
+
+    def apply_changes(self, upserts=(), removals=()):
+        # Cambios locales sobre el modelo (p.ej. optimistas, antes de que se guarden)
+        upserts = [(item.path, item) for item in upserts]
+        removals = [os.path.normpath(path) for path in removals]
+        small = len(upserts) + len(removals) <= 100
+        keys = [self._sort_keys[path] for path in self.order] if small else None
+        def drop(path):
+            old_key = self._sort_keys.pop(path, None)
+            if old_key is None: return
+            del self.items[path]
+            if small:
+                index = bisect.bisect_left(keys, old_key); del keys[index]; del self.order[index]
+        for path in removals: drop(path)
+        for path, item in upserts:
+            drop(path)
+            key = self._sort_keys[path] = self._sort_key(path, item)
+            self.items[path] = item
+            if small:
+                index = bisect.bisect_left(keys, key); keys.insert(index, key); self.order.insert(index, path)
+        if not small: self.order = sorted(self._sort_keys, key=self._sort_keys.__getitem__)
+        self.selected &= self.items.keys()
+        self._render(force=True)
+
+    def selection(self):
+        # Paths seleccionados en el orden de la lista
+        if len(self.selected) < 64: return sorted(self.selected, key=self._sort_keys.__getitem__)
+        return [path for path in self.order if path in self.selected]
+
+    def _window_for(self, top):
+        return max(0, top - self.buffer_rows), min(len(self.order), top + self.visible_rows() + self.buffer_rows)
+
+    def _render(self, force=False):
+        count = len(self.order); visible = self.visible_rows()
+        self.top = max(0, min(self.top, count - visible))
+        start, end = self.window
+        margin = self.buffer_rows // 2
+        # Solo se cambia la ventana si la parte visible se acerca a su borde (histeresis)
+        needs_window = (force or self.top - start < min(margin, self.top) or end - (self.top + visible) < min(margin, count - self.top - visible)
+                        or end > count)
+        if needs_window:
+            self._materialize(*self._window_for(self.top))
+        start, end = self.window
+        if end > start: self.tree.yview_moveto((self.top - start) / (end - start))
+        self._update_scrollbar()
+
+    def _materialize(self, start, end):
+        wanted = self.order[start:end]
+        wanted_set = set(wanted)
+        stale = [path for path in self._shown if path not in wanted_set]
+        if stale: self.tree.delete(*stale)
+        for path in stale: del self._shown[path]
+        kept = [path for path in wanted if path in self._shown]
+        in_order = list(self.tree.get_children()) == kept
+        for position, path in enumerate(wanted):
+            item = self.items[path]
+            try: values = self.formatter(item)
             except Exception as e:
-                print(f"(GUI Checker) Error inesperado procesando {path_to_process}: {e}")
-                traceback.print_exc()
-                if app and app.root.winfo_exists(): app.root.after(0, lambda p=path_to_process, err=e: messagebox.showerror("Error Inesperado", f"Error procesando:\n{p}\n\nError: {err}", parent=app.root))
-            
-            if is_periodic and not action_successful:
-                 print(f"(GUI Checker) WARN: Item periodico '{path_to_process}' tuvo un error durante el borrado/procesamiento. No se reprogramara ni mantendra.")
-            elif is_periodic and action_successful and not any(id(x) == id(item) for x in items_to_keep):
-                 print(f"(GUI Checker) CRITICAL WARN: Item periodico '{path_to_process}' procesado exitosamente PERO NO AÑADIDO A items_to_keep. Original Duration: {original_duration}. Esto es un bug.")
-        
-        else: # No es tiempo de borrar
-            if os.path.exists(path_to_process) or is_periodic:
-                items_to_keep.append(item_original)
+                print(f"Error formateando item: {item} - Error: {e}\n{traceback.format_exc()}"); values = ("", os.path.basename(path), os.path.dirname(path), "", "")
+            if path not in self._shown:
+                self.tree.insert('', position, iid=path, values=values)
             else:
-                print(f"(GUI Checker) Elemento no encontrado y no periodico (se quitara): {path_to_process}")
-                items_processed_this_run = True
-
-    if items_processed_this_run :
-         print(f"(GUI Checker) INFO: Actualizando schedule.json porque se procesaron items 'due'. Items a mantener/reprogramados: {len(items_to_keep)}")
-         save_schedule(items_to_keep) # Usa la función save_schedule global
-         if app is not None and app.root.winfo_exists(): app.root.after(0, app.refresh_list)
-    elif len(schedule) != len(items_to_keep):
-        print(f"(GUI Checker) INFO: Actualizando schedule.json porque items no existentes y no periodicos fueron eliminados. Items a mantener: {len(items_to_keep)}")
-        save_schedule(items_to_keep)
-        if app is not None and app.root.winfo_exists(): app.root.after(0, app.refresh_list)
-
-
-    if checker_thread is not None and checker_thread.is_alive() and app is not None and app.root.winfo_exists():
-         # Asegurarse de que el timer es el del checker de la GUI (check_and_delete de este archivo)
-         timer = threading.Timer(CHECK_INTERVAL_SECONDS, check_and_delete)
-         timer.daemon = True
-         timer.start()
-# --- Fin Background Checker (GUI) ---
+                if self._shown[path] != values: self.tree.item(path, values=values)
+                if not in_order: self.tree.move(path, '', position)
+            self._shown[path] = values
+        self.window = (start, end)
+        visible_selection = [path for path in wanted if path in self.selected]
+        if tuple(visible_selection) != self.tree.selection(): self.tree.selection_set(visible_selection)
+
+    def _update_scrollbar(self):
+        count = len(self.order)
+        if count == 0: self.scrollbar.set(0, 1); return
+        self.scrollbar.set(self.top / count, min(self.top + self.visible_rows(), count) / count)
+
+    def _on_tree_scroll(self, first, last):
+        # El Treeview se ha desplazado dentro de la ventana (rueda, teclado, see())
+        start, end = self.window
+        top = start + int(round(float(first) * (end - start)))
+        if top != self.top:
+            self.top = top; self._render()
+        else: self._update_scrollbar()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        count = len(self.order)
+        if action == 'moveto': self.top = int(float(amount) * count)
+        elif action == 'scroll': self.top += int(amount) * (self.visible_rows() if unit == 'pages' else 1)
+        self._render()
+
+    def _on_click(self, event):
+        # Un clic sin Ctrl/Shift empieza una seleccion nueva, tambien fuera de la ventana materializada
+        if not event.state & 0x0005: self.selected.clear()
+
+    def _on_select(self, event):
+        shown = self._shown.keys()
+        self.selected = {path for path in self.selected if path not in shown} | set(self.tree.selection())
+
+class ScheduleWorker:
+    # Hilo que hace toda la E/S del schedule de la GUI (cargas, altas, bajas) para que el bucle de Tk
+    # no espere nunca a un lock ni a un parseo. Los resultados vuelven al hilo de Tk con root.after.
+    def __init__(self, root):
+        self.root = root
+        self._jobs = queue.Queue()
+        self._refresh_queued = False
+        self._closing = False
+        self._guard = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="tempodel-gui-io", daemon=True)
+        self._thread.start()
+
+    def submit(self, job, on_done=None):
+        # job() corre en el hilo de E/S; on_done(resultado, error) en el de Tk
+        self._jobs.put((job, on_done))
+
+    def request_refresh(self, job, on_done):
+        # Las peticiones de refresco que se acumulan mientras hay trabajo pendiente se agrupan en una
+        with self._guard:
+            if self._refresh_queued: return
+            self._refresh_queued = True
+        def refresh_job():
+            with self._guard: self._refresh_queued = False
+            return job()
+        self.submit(refresh_job, on_done)
+
+    def _run(self):
+        while True:
+            job, on_done = self._jobs.get()
+            if job is None: break
+            result = error = None
+            try: result = job()
+            except Exception as e:
+                error = e; print(f"Error en la E/S del schedule: {e}\n{traceback.format_exc()}")
+            if on_done is not None and not self._closing: # Cerrando: el hilo de Tk esta en stop()
+                try: self.root.after(0, on_done, result, error)
+                except (RuntimeError, tk.TclError): pass # La ventana ya se cerro
+
+    def stop(self, timeout=WORKER_CLOSE_TIMEOUT_SECONDS):
+        # Termina lo que haya en cola (escrituras incluidas) y para el hilo
+        self._closing = True
+        self._jobs.put((None, None))
+        self._thread.join(timeout)
 
 class TempodelApp:
     def __init__(self, root):
@@ -333,9 +236,15 @@ class TempodelApp:
         self.tree.heading('Periodico', text='Periódico'); self.tree.column('Periodico', width=70, anchor=tk.CENTER)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview); scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.config(yscrollcommand=scrollbar.set)
-        self.tree_item_paths = {}; self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL); scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.view = VirtualScheduleView(self.tree, scrollbar, self.format_item_for_treeview)
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select, add='+')
+        self.worker = ScheduleWorker(self.root)
+        self._pending_changes = {} # id -> (upserts, removals) mostrados pero aun no confirmados en disco
+        self._next_change_id = 0
+        self.collector = None # PathCollector del listener de instancia unica (tempodel_configure.py)
+        self._collect_timer = None
+        self._collect_dialog_open = False
         
         button_frame = ttk.Frame(main_frame, padding="5"); button_frame.pack(fill=tk.X, pady=(5,0))
         style = ttk.Style(); style.configure('TButton', padding=5, font=('Segoe UI', 9))
@@ -348,40 +257,48 @@ class TempodelApp:
         self.refresh_list(); self.update_button_states(); self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def update_button_states(self):
-        state = tk.NORMAL if self.tree.selection() else tk.DISABLED
+        state = tk.NORMAL if self.view.selected else tk.DISABLED
         self.modify_button.config(state=state)
         self.remove_button.config(state=state)
 
     def on_tree_select(self, event): self.update_button_states()
 
     def format_item_for_treeview(self, item):
-        path = os.path.normpath(item['path'])
+        path = item.path
         try:
-            delete_timestamp = float(item.get('delete_at', 0))
+            delete_timestamp = item.delete_at
             delete_str = datetime.datetime.fromtimestamp(delete_timestamp).strftime('%Y-%m-%d %H:%M:%S') if delete_timestamp > 0 else "N/A"
         except (ValueError, TypeError, OSError): delete_str = "Fecha Invalida"
         
-        kind = "Carpeta" if item.get('is_dir', False) else "Archivo"
+        kind = "Regla" if item.rule is not None else "Carpeta" if item.is_dir else "Archivo"
         name = os.path.basename(path); parent_dir = os.path.dirname(path)
-        periodic_str = "Sí" if item.get('periodic', False) else "No"
+        periodic_str = "Sí" if item.periodic else "No"
         
-        return kind, name, parent_dir, delete_str, periodic_str, path
+        return kind, name, parent_dir, delete_str, periodic_str
 
     def refresh_list(self):
-        for i in self.tree.get_children(): self.tree.delete(i)
-        self.tree_item_paths.clear()
-        schedule = load_schedule()
-        schedule.sort(key=lambda x: (x.get('delete_at', 0) if x.get('delete_at') is not None else float('inf'))) # Manejar None en delete_at
-        
-        for item in schedule:
-            if not all(k in item for k in ('path', 'delete_at', 'is_dir')): continue
-            try:
-                 kind, name, parent_dir, delete_str, periodic_str, full_path = self.format_item_for_treeview(item)
-                 item_id = self.tree.insert('', tk.END, values=(kind, name, parent_dir, delete_str, periodic_str))
-                 self.tree_item_paths[item_id] = full_path
-            except Exception as e: print(f"Error formateando item: {item} - Error: {e}\n{traceback.format_exc()}")
+        # Carga y ordena en el hilo de E/S; en el de Tk solo se aplica el diff de las filas visibles
+        self.worker.request_refresh(lambda: VirtualScheduleView.build_model(load_items()), self._on_refresh_loaded)
+
+    def _on_refresh_loaded(self, model, error):
+        if error is not None or model is None: return
+        self.view.set_model(model)
+        # Los cambios optimistas que aun no estan en disco se vuelven a aplicar encima
+        for upserts, removals in self._pending_changes.values(): self.view.apply_changes(upserts, removals)
         self.update_button_states()
 
+    def _apply_optimistic(self, upserts, removals, write_job, error_message):
+        # Muestra el cambio ya y lo guarda en el hilo de E/S; si falla, se avisa y se recarga desde disco
+        change_id = self._next_change_id; self._next_change_id += 1
+        self._pending_changes[change_id] = (upserts, removals)
+        self.view.apply_changes(upserts, removals); self.update_button_states()
+        def on_written(ok, error):
+            self._pending_changes.pop(change_id, None)
+            if error is not None or not ok:
+                messagebox.showerror("Error", error_message, parent=self.root)
+            self.refresh_list()
+        self.worker.submit(write_job, on_written)
+
     def _configure_items_dialog(self, item_paths_with_type_hint, is_modification=False):
         if not item_paths_with_type_hint: return
 
@@ -408,27 +325,24 @@ class TempodelApp:
         periodic_check.pack(pady=10)
         
         if is_modification and num_items == 1:
-            schedule_list = load_schedule() # Renombrar para evitar conflicto con global
-            norm_path = os.path.normpath(first_item_path)
-            for item_s_cfg in schedule_list:
-                if os.path.normpath(item_s_cfg['path']) == norm_path:
-                    if item_s_cfg.get('periodic', False):
-                        periodic_var.set(True)
-                        if 'original_duration_seconds' in item_s_cfg:
-                            ods = float(item_s_cfg['original_duration_seconds'])
-                            if ods % (24*3600) == 0 and ods >= (24*3600) :
-                                value_var.set(str(int(ods / (24*3600))))
-                                unit_var.set("Días")
-                            elif ods % 3600 == 0 and ods >= 3600:
-                                value_var.set(str(int(ods / 3600)))
-                                unit_var.set("Horas")
-                            elif ods % 60 == 0 and ods >= 60:
-                                value_var.set(str(int(ods / 60)))
-                                unit_var.set("Minutos")
-                            else:
-                                value_var.set(str(int(ods)))
-                                unit_var.set("Segundos")
-                    break
+            # El item ya esta en el modelo de la lista: no hace falta releer el schedule
+            item_s_cfg = self.view.items.get(os.path.normpath(first_item_path))
+            if item_s_cfg is not None and item_s_cfg.periodic:
+                periodic_var.set(True)
+                if item_s_cfg.duration is not None:
+                    ods = item_s_cfg.duration
+                    if ods % (24*3600) == 0 and ods >= (24*3600) :
+                        value_var.set(str(int(ods / (24*3600))))
+                        unit_var.set("Días")
+                    elif ods % 3600 == 0 and ods >= 3600:
+                        value_var.set(str(int(ods / 3600)))
+                        unit_var.set("Horas")
+                    elif ods % 60 == 0 and ods >= 60:
+                        value_var.set(str(int(ods / 60)))
+                        unit_var.set("Minutos")
+                    else:
+                        value_var.set(str(int(ods)))
+                        unit_var.set("Segundos")
 
         def on_ok():
             try:
@@ -445,24 +359,18 @@ class TempodelApp:
             delete_timestamp = time.time() + user_duration_seconds
             is_periodic_val = periodic_var.get()
             
-            success_count = 0; fail_count = 0
-            
-            for path, _is_dir_hint_val in item_paths_with_type_hint:
-                # add_item_to_schedule determinará is_dir basado en el estado actual del disco.
-                # El _is_dir_hint_val es más para casos donde el path no existe y se quiere forzar el tipo.
-                # (Funcionalidad no completamente implementada en add_item_to_schedule)
-                if add_item_to_schedule(path, delete_timestamp, is_periodic_val, user_duration_seconds if is_periodic_val else None):
-                    success_count += 1
-                else:
-                    fail_count += 1 # add_item_to_schedule ahora siempre retorna True, esta lógica podría cambiar si retorna False en errores
-            
-            print(f"Configuración completada. Exitos: {success_count}, Fallos: {fail_count}")
-            if fail_count > 0 and success_count == 0:
-                messagebox.showerror("Error", "No se pudieron añadir/modificar los items.", parent=dialog)
-            elif fail_count > 0 :
-                 messagebox.showwarning("Atención", f"{fail_count} item(s) no pudieron ser añadidos/modificados (ver consola para detalles).", parent=dialog)
-
-            self.refresh_list(); dialog.destroy()
+            # Toda la seleccion en un solo append al journal. add_items determinará is_dir basado en el
+            # estado actual del disco (el _is_dir_hint_val no se usa para paths que no existen).
+            # Al modificar una carpeta periodica se conserva su tope de tamaño (se pone con tempodel_client.py add --max)
+            entries = [(path, delete_timestamp, is_periodic_val, user_duration_seconds if is_periodic_val else None,
+                        getattr(self.view.items.get(os.path.normpath(path)), 'max_bytes', None) if is_modification and is_periodic_val else None)
+                       for path, _is_dir_hint_val in item_paths_with_type_hint]
+            # Se muestran ya en la lista (con el tipo aproximado) y se guardan en el hilo de E/S
+            upserts = [ScheduleItem(os.path.normpath(path), delete_timestamp, is_dir_hint_val, is_periodic_val)
+                       for path, is_dir_hint_val in item_paths_with_type_hint]
+            self._apply_optimistic(upserts, (), lambda: add_items(entries), "No se pudieron añadir/modificar los items.")
+            print(f"Configuración enviada. {len(entries)} item(s).")
+            dialog.destroy()
 
         def on_cancel(): dialog.destroy()
         
@@ -482,29 +390,26 @@ class TempodelApp:
         if folderpath: self._configure_items_dialog([(folderpath, True)]) # True es is_dir_hint
 
     def modify_selected(self):
-        selected_items_ids = self.tree.selection()
-        if not selected_items_ids: return
+        selected_paths = self.view.selection()
+        if not selected_paths: return
         
         paths_to_modify = []
-        for sid in selected_items_ids:
-            path = self.tree_item_paths.get(sid)
-            if path:
-                item_values = self.tree.item(sid, 'values')
-                is_dir_hint_val = (item_values[0].lower() == "carpeta") if item_values and len(item_values) > 0 else False
-                paths_to_modify.append((path, is_dir_hint_val))
+        for path in selected_paths:
+            item = self.view.items.get(path)
+            if item is not None and item.rule is None: paths_to_modify.append((path, item.is_dir))
         
         if paths_to_modify:
             self._configure_items_dialog(paths_to_modify, is_modification=True)
         else:
-            messagebox.showerror("Error", "No se pudo obtener la ruta de los items seleccionados.")
+            # Las reglas se crean con tempodel_client.py rule; aqui solo se pueden quitar
+            messagebox.showerror("Error", "No se pudo obtener la ruta de los items seleccionados (las reglas no se pueden modificar desde aquí).")
 
     def remove_selected(self):
-        selected_items = self.tree.selection()
-        if not selected_items: return
+        selected_paths = self.view.selection()
+        if not selected_paths: return
         paths_to_remove = []; names_to_remove = []
-        for sid in selected_items:
-             path = self.tree_item_paths.get(sid)
-             if path: paths_to_remove.append(path); names_to_remove.append(os.path.basename(path))
+        for path in selected_paths:
+             if path in self.view.items: paths_to_remove.append(path); names_to_remove.append(os.path.basename(path))
         
         if not paths_to_remove: messagebox.showerror("Error", "No se pudo obtener la ruta."); return
         
@@ -513,146 +418,80 @@ class TempodelApp:
         num = len(paths_to_remove)
         
         if messagebox.askyesno("Confirmar", f"Cancelar borrado de {num} elemento(s)?\n - {names_str}", parent=self.root):
-            removed_count = sum(1 for path_rem in paths_to_remove if remove_item_from_schedule(path_rem))
-            print(f"Quitados {removed_count} de {num}."); self.refresh_list()
+            self._apply_optimistic((), paths_to_remove, lambda: remove_items(paths_to_remove), "No se pudieron quitar los items.")
+            print(f"Quitados {num}.")
+
+    # --- Rutas recibidas por el listener de instancia unica (multi-seleccion del menu contextual) ---
+    def attach_collector(self, collector):
+        self.collector = collector
+        collector.on_arrival = lambda: self.root.after(0, self._on_paths_arrived) # Llega desde el hilo del listener
+        self._on_paths_arrived()
+
+    def _on_paths_arrived(self):
+        # Debounce sobre la llegada de mensajes: cada uno reinicia la espera
+        if self._collect_timer is not None: self.root.after_cancel(self._collect_timer)
+        self._collect_timer = self.root.after(MULTI_SELECT_DEBOUNCE_MS, self._open_collected_dialog)
+
+    def _open_collected_dialog(self):
+        self._collect_timer = None
+        if self._collect_dialog_open: return # Al cerrarse el dialogo se vuelve a mirar la cola
+        paths = self.collector.drain()
+        self.root.deiconify(); self.root.lift(); self.root.focus_force()
+        if not paths: return
+        print(f">>> Procesando {len(paths)} paths recibidos...")
+        self._collect_dialog_open = True
+        try: self._configure_items_dialog([(path, os.path.isdir(path)) for path in paths])
+        finally: self._collect_dialog_open = False
+        if not self.collector.paths.empty(): self._on_paths_arrived()
 
     def on_closing(self):
         print("Cerrando Tempodel GUI...")
-        global app, checker_thread
-        # El checker_thread usa threading.Timer que es difícil de cancelar limpiamente una vez iniciado.
-        # Establecer app = None evitará que se reprograme si la GUI se cierra.
+        global app
         _app_ref = app # Guardar referencia localmente
-        app = None 
-        
-        # Si el checker_thread es una instancia de threading.Timer, no tiene un método join() simple
-        # o una forma de cancelarlo directamente si ya está en su fase de espera.
-        # Al ser daemon, debería terminar cuando el hilo principal (GUI) termine.
-        # No intentamos 'join' aquí para evitar colgar la GUI al cerrar.
-        
-        _cleanup_temp_files() 
+        app = None # Las notificaciones del motor que lleguen ya no tocan la ventana
+        # Parar el motor; si es el lider, suelta el lock en cuanto termine el lote en curso
+        # y otro proceso (el checker) toma el relevo. No se hace join para no colgar la GUI al cerrar.
+        if engine is not None: engine.stop()
+        if _app_ref is not None: _app_ref.worker.stop() # Termina las escrituras que queden en cola
+        if single_instance_server is not None: single_instance_server.close()
         if _app_ref and _app_ref.root: # Usar la referencia local
             _app_ref.root.destroy()
         print("Tempodel GUI cerrada.")
 
-# --- Funciones Auxiliares para Multi-Selección (Sin cambios) ---
-def _acquire_lock():
-    try:
-        fd = os.open(CONFIGURE_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
-        os.close(fd); print(f"Lock adquirido: {CONFIGURE_LOCK_FILE}"); return True
-    except FileExistsError: print(f"Lock ya existe: {CONFIGURE_LOCK_FILE}"); return False
-    except Exception as e: print(f"Error adquiriendo lock: {e}"); return False
-def _release_lock():
-    try:
-        if os.path.exists(CONFIGURE_LOCK_FILE): os.remove(CONFIGURE_LOCK_FILE); print(f"Lock liberado: {CONFIGURE_LOCK_FILE}")
-    except Exception as e: print(f"Error liberando lock: {e}")
-def _touch_lock():
-    try:
-        if os.path.exists(CONFIGURE_LOCK_FILE): os.utime(CONFIGURE_LOCK_FILE, None); print(f"Lock 'touched': {CONFIGURE_LOCK_FILE}"); return True
-    except Exception as e: print(f"Error 'touching' lock: {e}"); return False
-def _get_lock_mtime():
-    try:
-        if os.path.exists(CONFIGURE_LOCK_FILE): return os.path.getmtime(CONFIGURE_LOCK_FILE)
-    except Exception as e: print(f"Error obteniendo mtime del lock: {e}"); return 0
-def _append_pending_path(path):
-    try:
-        os.makedirs(os.path.dirname(PENDING_PATHS_FILE), exist_ok=True)
-        with open(PENDING_PATHS_FILE, "a", encoding='utf-8') as f: f.write(path + "\n"); print(f"Path añadido a pendientes: {path}")
-    except Exception as e: print(f"Error añadiendo path a pendientes: {e}")
-def _read_pending_paths():
-    paths = []
-    try:
-        if os.path.exists(PENDING_PATHS_FILE):
-            with open(PENDING_PATHS_FILE, "r", encoding='utf-8') as f: paths = [line.strip() for line in f if line.strip()]
-            print(f"Leidos {len(paths)} paths de pendientes.")
-    except Exception as e: print(f"Error leyendo paths pendientes: {e}")
-    return paths
-def _cleanup_pending_file():
-     try:
-         if os.path.exists(PENDING_PATHS_FILE): os.remove(PENDING_PATHS_FILE); print("Archivo de paths pendientes eliminado.")
-     except Exception as e: print(f"Error eliminando archivo de pendientes: {e}")
-def _cleanup_temp_files():
-    print("Limpiando archivos temporales de configuracion multi-select...")
-    _release_lock(); _cleanup_pending_file()
-
-def _process_collected_paths(app_instance_proc):
-    print(">>> Procesando paths recolectados...")
-    pending_paths_raw = _read_pending_paths()
-    _release_lock() 
-
-    if pending_paths_raw:
-        item_paths_with_type_proc = []
-        for p_proc in pending_paths_raw:
-             is_dir_hint_proc = os.path.isdir(p_proc) 
-             item_paths_with_type_proc.append((p_proc, is_dir_hint_proc))
-
-        # Filtrar paths que existen, pero pasar todos los recolectados al diálogo si queremos permitir configurar paths no existentes
-        # Para este caso, el diálogo _configure_items_dialog ya maneja paths no existentes si son periódicos.
-        # No filtraremos aquí, dejaremos que _configure_items_dialog y add_item_to_schedule decidan.
-        
-        if item_paths_with_type_proc:
-            if app_instance_proc and app_instance_proc.root.winfo_exists():
-                 app_instance_proc.root.after(0, lambda paths_arg=item_paths_with_type_proc: app_instance_proc._configure_items_dialog(paths_arg))
-            else: print("ERROR: Instancia de la App no disponible para mostrar dialogo de multi-select.")
-        else:
-             print("No se encontraron paths pendientes para procesar (quizás solo se lanzó una instancia).")
-
-def _check_if_ready_to_process(app_instance_check, expected_mtime):
-    print(f"Check MultiSelect: Verificando mtime (esperado <= {expected_mtime})...")
-    current_mtime = _get_lock_mtime(); print(f"Check MultiSelect: Mtime actual: {current_mtime}")
-    if not os.path.exists(CONFIGURE_LOCK_FILE):
-        print("WARN MultiSelect: Lock file desaparecio. Cancelando."); _cleanup_temp_files(); return
-    if current_mtime > expected_mtime + 0.1: # Tolerancia pequeña
-        print(f"Check MultiSelect: Mtime ha cambiado. Reprogramando check...")
-        if app_instance_check and app_instance_check.root.winfo_exists():
-             app_instance_check.root.after(MULTI_SELECT_WAIT_MS, lambda inst_arg=app_instance_check, mtime_arg=current_mtime: _check_if_ready_to_process(inst_arg, mtime_arg))
-        else: print("ERROR MultiSelect: No se puede reprogramar check, app no disponible."); _cleanup_temp_files()
-    else:
-        print("Check MultiSelect: Mtime no ha cambiado. Listo para procesar.")
-        if app_instance_check and app_instance_check.root.winfo_exists(): _process_collected_paths(app_instance_check)
-        else: print("ERROR MultiSelect: No se puede procesar, app no disponible."); _cleanup_temp_files()
+# --- Notificaciones del motor de caducidad (llegan desde su hilo) ---
+def _on_schedule_changed():
+    app_ref = app
+    if app_ref is not None and app_ref.root.winfo_exists(): app_ref.root.after(0, app_ref.refresh_list)
+
+def _on_delete_error(path, error):
+    app_ref = app
+    if app_ref is not None and app_ref.root.winfo_exists():
+        app_ref.root.after(0, lambda p=path, err=error: messagebox.showerror("Error de Borrado", f"No se pudo borrar:\n{p}\n\nError: {err}", parent=app_ref.root))
 
 # --- Punto de Entrada Principal ---
+def main(server=None, collector=None):
+    # server/collector vienen de tempodel_configure.acquire_instance (listener de instancia unica)
+    global app, engine, engine_thread, single_instance_server
+    single_instance_server = server
+    root = tk.Tk()
+    app = TempodelApp(root)
+
+    # Motor de caducidad compartido: si no hay otro lider (checker u otra GUI) esta GUI ejecuta
+    # los borrados; si lo hay, solo vigila el schedule y refresca la lista cuando cambia.
+    if engine_thread is None or not engine_thread.is_alive():
+        print("Iniciando motor de caducidad de la GUI...")
+        from tempodel_engine import ExpiryEngine # Import diferido: la ventana aparece antes
+        engine = ExpiryEngine("tempodel_gui", on_change=_on_schedule_changed, on_error=_on_delete_error)
+        engine_thread = threading.Thread(target=engine.run, kwargs={'threaded': True}, name="tempodel-engine", daemon=True)
+        engine_thread.start()
+
+    if collector is not None: app.attach_collector(collector)
+    root.mainloop()
+
 if __name__ == "__main__":
-    path_from_context_menu = None
-    is_configure_action = False
-
-    if len(sys.argv) > 1:
-        potential_path = sys.argv[1]
-        path_from_context_menu = os.path.normpath(potential_path)
-        is_configure_action = True
-        print(f"Instancia GUI iniciada para configurar: {path_from_context_menu}")
-
-    master_instance = False
-    if is_configure_action and path_from_context_menu:
-        if _acquire_lock():
-            master_instance = True; print("MASTER: Lock adquirido.")
-            _cleanup_pending_file(); _append_pending_path(path_from_context_menu)
-            initial_mtime = _get_lock_mtime(); print(f"MASTER: Mtime inicial del lock: {initial_mtime}.")
-        else:
-            print("SECONDARY: Lock ya existe.")
-            _append_pending_path(path_from_context_menu); _touch_lock()
-            print("SECONDARY: Path añadido y lock 'touched'. Saliendo."); sys.exit(0)
-
-    if not is_configure_action or master_instance:
-        root = tk.Tk()
-        app = TempodelApp(root)
-
-        # Iniciar el checker de la GUI
-        if checker_thread is None or not checker_thread.is_alive():
-            print("Iniciando checker thread de borrado de la GUI...")
-            # El checker de la GUI (check_and_delete de este archivo) se auto-reprograma con Timer.
-            # Hacemos la primera llamada.
-            initial_delay_checker = 1 # Pequeño delay para que la GUI se asiente
-            checker_thread = threading.Timer(initial_delay_checker, check_and_delete)
-            checker_thread.daemon = True
-            checker_thread.start()
-            print(f"Checker thread de borrado de la GUI programado para iniciar en {initial_delay_checker}s.")
-
-        if master_instance and 'initial_mtime' in locals() and initial_mtime is not None:
-             print(f"MASTER: Programando _check_if_ready_to_process en {MULTI_SELECT_WAIT_MS} ms (mtime esperado: {initial_mtime})")
-             root.after(MULTI_SELECT_WAIT_MS, lambda inst_main=app, mtime_main=initial_mtime: _check_if_ready_to_process(inst_main, mtime_main))
-        elif master_instance:
-             print("ERROR CRITICO: Master instance sin initial_mtime valido. No se puede programar check de multi-select."); _cleanup_temp_files()
-        
-        root.mainloop()
-        print("Saliendo del script principal de Tempodel GUI.")
\ No newline at end of file
+    from tempodel_configure import acquire_instance
+    # Con rutas (menu contextual antiguo) o sin ellas: si ya hay una GUI abierta se le entregan y se sale
+    instance = acquire_instance(sys.argv[1:])
+    if instance is None:
+        print("Rutas entregadas a la instancia de Tempodel ya abierta. Saliendo."); sys.exit(0)
+    main(*instance)
@@ -0,0 +1,242 @@
+import json
+import os
+import select
+import socket
+import sys
+import threading
+import time
+
+# --- API local del checker (pipe con nombre en Windows, socket Unix en el resto) ---
+# Cada mensaje es un objeto JSON en una linea terminada en '\n': {"op": ..., ...} -> {"ok": true, "result": ...}
+# o {"ok": false, "error": "..."}. En POSIX el socket es de flujo y sin otro framing, asi que sirve cualquier
+# cliente (p.ej. `echo '{"op": "list"}' | socat - UNIX-CONNECT:tempodel.sock`). En Windows el pipe es en modo
+# mensaje: cada linea va en un solo WriteFile (p.ej. NamedPipeClientStream desde PowerShell) y cada respuesta
+# llega en un mensaje, que un cliente en modo byte lee como una linea mas.
+# El store (y lo que solo usa el servidor) se importa al atenderlo, para que los clientes arranquen rapido.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if sys.platform == "win32":
+    from multiprocessing.connection import Listener, Client
+    IPC_FAMILY = "AF_PIPE"
+    IPC_ADDRESS = r"\\.\pipe\tempodel-" + (os.environ.get("USERNAME") or "default")
+    GUI_IPC_ADDRESS = IPC_ADDRESS + "-gui" # Listener de instancia unica de la GUI
+else:
+    IPC_FAMILY = "AF_UNIX"
+    _DATA_DIR = os.environ.get("TEMPODEL_DATA_DIR") or SCRIPT_DIR # Junto al schedule que se sirve
+    IPC_ADDRESS = os.path.join(_DATA_DIR, "tempodel.sock")
+    GUI_IPC_ADDRESS = os.path.join(_DATA_DIR, "tempodel_gui.sock")
+IPC_TIMEOUT_SECONDS = 5
+IPC_MAX_MESSAGE_BYTES = 64 * 1024 * 1024 # Una linea mas larga corta la conexion
+
+class IpcUnavailable(Exception):
+    # No hay checker escuchando (o no respondio a tiempo): el cliente debe usar el store directamente
+    pass
+
+def _encode(message): return (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+
+def _decode(data): return json.loads(data.decode('utf-8'))
+
+class _LineConnection:
+    # Socket Unix de flujo con un mensaje por linea; misma interfaz que multiprocessing.connection
+    def __init__(self, sock):
+        self._sock = sock
+        self._buffer = b""
+
+    def send_bytes(self, data): self._sock.sendall(data)
+
+    def poll(self, timeout):
+        if b"\n" in self._buffer: return True
+        ready, _, _ = select.select([self._sock], [], [], timeout)
+        return bool(ready)
+
+    def recv_bytes(self):
+        while b"\n" not in self._buffer:
+            if len(self._buffer) > IPC_MAX_MESSAGE_BYTES: raise EOFError("Mensaje IPC demasiado largo")
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                if self._buffer.strip(): break # Ultima linea sin '\n' antes de cerrar
+                raise EOFError()
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line
+
+    def close(self): self._sock.close()
+
+class _LineListener:
+    def __init__(self, address):
+        self.address = address
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.bind(address); self._sock.listen(16)
+        except OSError:
+            self._sock.close(); raise
+
+    def accept(self): return _LineConnection(self._sock.accept()[0])
+
+    def close(self):
+        try: self._sock.shutdown(socket.SHUT_RDWR) # Despierta al hilo bloqueado en accept()
+        except OSError: pass
+        self._sock.close()
+        try: os.remove(self.address)
+        except OSError: pass
+
+def _connect(address, family, timeout=IPC_TIMEOUT_SECONDS):
+    if family != "AF_UNIX": return Client(address, family=family)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout) # Tambien acota un recv con la respuesta a medias
+    try: sock.connect(address)
+    except OSError:
+        sock.close(); raise
+    return _LineConnection(sock)
+
+def _listen(address, family):
+    return _LineListener(address) if family == "AF_UNIX" else Listener(address, family=family)
+
+# --- Cliente ---
+def call(op, timeout=IPC_TIMEOUT_SECONDS, address=IPC_ADDRESS, family=IPC_FAMILY, **params):
+    # Devuelve 'result' de la respuesta; IpcUnavailable si no hay servidor, RuntimeError si la operacion fallo
+    try:
+        conn = _connect(address, family, timeout)
+    except OSError as e:
+        raise IpcUnavailable(str(e))
+    try:
+        conn.send_bytes(_encode(dict(params, op=op)))
+        if not conn.poll(timeout): raise IpcUnavailable(f"Sin respuesta del checker en {timeout}s")
+        response = _decode(conn.recv_bytes())
+    except (OSError, EOFError, ValueError) as e:
+        raise IpcUnavailable(str(e))
+    finally:
+        conn.close()
+    if not response.get('ok'): raise RuntimeError(response.get('error', 'Error desconocido'))
+    return response.get('result')
+
+# --- Servidor ---
+def _item_for_response(item):
+    return {k: item[k] for k in ('path', 'delete_at', 'is_dir', 'periodic', 'original_duration_seconds', 'rule', 'max_bytes') if k in item}
+
+def handle_request(request):
+    import tempodel_store
+    op = request.get('op')
+    if op == 'ping':
+        return {"pid": os.getpid(), "backend": tempodel_store.STORE_BACKEND}
+    if op == 'add':
+        # {"op": "add", "path": ..., "delete_at": ..., "periodic": false, "duration": null, "max_bytes": null}
+        # o en bloque {"op": "add", "items": [{"path": ..., "delete_at": ..., ...}, ...]}
+        entries = request['items'] if isinstance(request.get('items'), list) else [request]
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str) or entry.get('delete_at') is None:
+                raise ValueError("'add' necesita 'path' y 'delete_at' en cada item")
+            if not os.path.isabs(entry['path']): # Relativo al directorio del checker no significaria nada para el cliente
+                raise ValueError(f"'path' debe ser absoluto: {entry['path']!r}")
+            if isinstance(entry['delete_at'], bool) or not isinstance(entry['delete_at'], (int, float, str)):
+                raise ValueError(f"'delete_at' invalido: {entry['delete_at']!r}")
+            for key in ('duration', 'max_bytes'):
+                if entry.get(key) is not None and (isinstance(entry[key], bool) or not isinstance(entry[key], (int, float))):
+                    raise ValueError(f"'{key}' invalido: {entry[key]!r}")
+        if not tempodel_store.add_items([(e['path'], float(e['delete_at']), bool(e.get('periodic', False)), e.get('duration'),
+                                          e.get('max_bytes')) for e in entries]):
+            raise RuntimeError("No se pudo guardar el schedule")
+        return len(entries)
+    if op == 'add_rule':
+        # {"op": "add_rule", "root": ..., "pattern": "*.tmp", "older_than": segundos, "interval": null, "age": "mtime"}
+        if not isinstance(request.get('root'), str) or not isinstance(request.get('pattern'), str) or request.get('older_than') is None:
+            raise ValueError("'add_rule' necesita 'root', 'pattern' y 'older_than'")
+        if not os.path.isabs(request['root']): raise ValueError(f"'root' debe ser absoluto: {request['root']!r}")
+        if not tempodel_store.add_rule(request['root'], request['pattern'], request['older_than'], request.get('interval'),
+                                       request.get('age', 'mtime'), bool(request.get('recursive', True))):
+            raise RuntimeError("No se pudo guardar el schedule")
+        return 1
+    if op == 'remove':
+        # {"op": "remove", "path": ...} o {"op": "remove", "paths": [...]}
+        paths = request['paths'] if isinstance(request.get('paths'), list) else [request.get('path')]
+        if not all(isinstance(p, str) for p in paths): raise ValueError("'remove' necesita 'path' o 'paths'")
+        if not tempodel_store.remove_items(paths): raise RuntimeError("No se pudo guardar el schedule")
+        return len(paths)
+    if op == 'list':
+        return [_item_for_response(item) for item in tempodel_store.load_schedule()]
+    if op == 'due':
+        # Items con delete_at <= 'before' (por defecto ahora), los mas antiguos primero
+        before = float(request.get('before') or time.time())
+        due = sorted((item for item in tempodel_store.load_schedule() if tempodel_store.delete_at_of(item) <= before),
+                     key=tempodel_store.delete_at_of)
+        if request.get('limit') is not None: due = due[:int(request['limit'])]
+        return [_item_for_response(item) for item in due]
+    if op == 'metrics':
+        # Contadores, gauges e histogramas del proceso del checker (y los ultimos spans con TEMPODEL_TRACE)
+        import tempodel_metrics
+        return tempodel_metrics.snapshot()
+    raise ValueError(f"Operacion desconocida: {op!r}")
+
+class IpcServer:
+    # Acepta conexiones en un hilo y atiende cada una en otro (las peticiones son cortas)
+    def __init__(self, handler=handle_request, address=IPC_ADDRESS, family=IPC_FAMILY):
+        self.handler = handler
+        self.address = address
+        self.family = family
+        self._listener = None
+        self._thread = None
+
+    def start(self, quiet=False):
+        # False si ya hay otro servidor en la direccion (o no se pudo abrir). Con quiet no se avisa
+        # de lo primero: es lo esperado cuando se usa como listener de instancia unica.
+        from tempodel_log import log_message
+        if self.family == "AF_UNIX":
+            # Comprobar-borrar-bind bajo lock, para que dos procesos no se pisen el socket
+            from tempodel_lock import FileLock
+            with FileLock(self.address + ".lock", tag="ipc"):
+                if os.path.exists(self.address):
+                    try:
+                        _connect(self.address, self.family).close()
+                        if not quiet: log_message(f"WARN: Ya hay un servidor IPC en {self.address}. No se inicia otro.")
+                        return False
+                    except OSError:
+                        os.remove(self.address) # Socket de un proceso que murio sin limpiar
+                if not self._listen(): return False
+                os.chmod(self.address, 0o600)
+        elif not self._listen(quiet): return False
+        self._thread = threading.Thread(target=self._accept_loop, name="tempodel-ipc", daemon=True)
+        self._thread.start()
+        if not quiet: log_message(f"INFO: API local escuchando en {self.address}")
+        return True
+
+    def _listen(self, quiet=False):
+        from tempodel_log import log_message
+        try:
+            self._listener = _listen(self.address, self.family)
+            return True
+        except OSError as e:
+            # En Windows el pipe se crea con FILE_FLAG_FIRST_PIPE_INSTANCE: falla si ya hay otro servidor
+            if not quiet: log_message(f"WARN: No se pudo abrir el endpoint IPC {self.address}: {e}")
+            return False
+
+    def _accept_loop(self):
+        while self._listener is not None:
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._listener is None: break # close()
+                time.sleep(0.1); continue
+            threading.Thread(target=self._serve, args=(conn,), name="tempodel-ipc-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        from tempodel_log import log_message
+        try:
+            while True:
+                try: data = conn.recv_bytes()
+                except (EOFError, OSError): break
+                if not data.strip(): continue # Lineas vacias de un cliente de shell
+                try:
+                    response = {"ok": True, "result": self.handler(_decode(data))}
+                except Exception as e:
+                    if not isinstance(e, (ValueError, RuntimeError)):
+                        import traceback
+                        log_message(f"ERROR: Peticion IPC: {e}\n{traceback.format_exc()}")
+                    response = {"ok": False, "error": str(e)}
+                conn.send_bytes(_encode(response))
+        finally:
+            conn.close()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try: listener.close()
+            except OSError: pass
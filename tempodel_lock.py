@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import errno
+
+import tempodel_metrics as metrics
+
+# --- Lock entre procesos para los ficheros del schedule ---
+# Se bloquea un byte de un fichero que nunca se borra: fcntl.flock en POSIX, LockFileEx en Windows.
+# Lectores en modo compartido, escritores en exclusivo; el SO libera el lock si el proceso muere.
+# Si el sistema de ficheros no soporta estos locks (algunas unidades de red) se usa un fichero
+# creado con O_EXCL que guarda el PID del dueño, y se considera caducado si ese proceso ya no existe.
+LOCK_TIMEOUT_SECONDS = 10
+SLOW_LOCK_WARN_SECONDS = 1.0
+_POLL_MIN_SECONDS = 0.002
+_POLL_MAX_SECONDS = 0.05
+
+
+if sys.platform == "win32":
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    class _OVERLAPPED(ctypes.Structure):
+        _fields_ = [("Internal", ctypes.c_void_p), ("InternalHigh", ctypes.c_void_p),
+                    ("Offset", wintypes.DWORD), ("OffsetHigh", wintypes.DWORD), ("hEvent", wintypes.HANDLE)]
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.LockFileEx.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, ctypes.POINTER(_OVERLAPPED)]
+    _kernel32.LockFileEx.restype = wintypes.BOOL
+    _kernel32.UnlockFileEx.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.DWORD, wintypes.DWORD, ctypes.POINTER(_OVERLAPPED)]
+    _kernel32.UnlockFileEx.restype = wintypes.BOOL
+    _kernel32.OpenProcess.argtypes = [wintypes.DWORD, wintypes.BOOL, wintypes.DWORD]
+    _kernel32.OpenProcess.restype = wintypes.HANDLE
+    _kernel32.GetExitCodeProcess.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.DWORD)]
+    _kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    _LOCKFILE_FAIL_IMMEDIATELY = 0x1
+    _LOCKFILE_EXCLUSIVE_LOCK = 0x2
+    _ERROR_LOCK_VIOLATION = 33
+    _ERROR_IO_PENDING = 997
+
+    def _try_os_lock(fd, shared):
+        flags = _LOCKFILE_FAIL_IMMEDIATELY | (0 if shared else _LOCKFILE_EXCLUSIVE_LOCK)
+        if _kernel32.LockFileEx(msvcrt.get_osfhandle(fd), flags, 0, 1, 0, ctypes.byref(_OVERLAPPED())): return True
+        error = ctypes.get_last_error()
+        if error in (_ERROR_LOCK_VIOLATION, _ERROR_IO_PENDING): return False
+        raise ctypes.WinError(error)
+
+    def _os_unlock(fd):
+        _kernel32.UnlockFileEx(msvcrt.get_osfhandle(fd), 0, 1, 0, ctypes.byref(_OVERLAPPED()))
+
+    def pid_alive(pid):
+        handle = _kernel32.OpenProcess(0x1000, False, pid) # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle: return ctypes.get_last_error() == 5 # ERROR_ACCESS_DENIED: existe pero no es nuestro
+        try:
+            exit_code = wintypes.DWORD()
+            if not _kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)): return True
+            return exit_code.value == 259 # STILL_ACTIVE
+        finally:
+            _kernel32.CloseHandle(handle)
+else:
+    import fcntl
+
+    def _try_os_lock(fd, shared):
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            return True
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EACCES): return False
+            raise
+
+    def _os_unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def pid_alive(pid):
+        try: os.kill(pid, 0)
+        except ProcessLookupError: return False
+        except PermissionError: return True
+        except OSError: return False
+        return True
+
+def _record_wait(wait_seconds, contended, timed_out=False):
+    # Espera de los locks de este proceso: contadores lock_* e histograma lock_wait_seconds
+    metrics.inc("lock_timeouts" if timed_out else "lock_acquisitions")
+    if contended: metrics.inc("lock_contended")
+    metrics.observe("lock_wait_seconds", wait_seconds)
+
+def lock_stats():
+    wait = metrics.REGISTRY.histogram("lock_wait_seconds") or {}
+    return {"acquisitions": metrics.REGISTRY.counter("lock_acquisitions"), "contended": metrics.REGISTRY.counter("lock_contended"),
+            "timeouts": metrics.REGISTRY.counter("lock_timeouts"), "total_wait_seconds": wait.get("sum", 0.0),
+            "max_wait_seconds": wait.get("max") or 0.0}
+
+class FileLock:
+    def __init__(self, path, shared=False, timeout=LOCK_TIMEOUT_SECONDS, tag=""):
+        self.path = path
+        self.shared = shared
+        self.timeout = timeout
+        self.tag = tag
+        self._fd = None
+        self._fallback_path = None
+        self.wait_seconds = 0.0
+
+    def acquire(self):
+        start = time.perf_counter()
+        delay = _POLL_MIN_SECONDS
+        contended = False
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        use_os_lock = True
+        try:
+            while True:
+                if use_os_lock:
+                    try:
+                        if _try_os_lock(fd, self.shared):
+                            self._fd = fd; break
+                    except OSError: # El sistema de ficheros no soporta locks: usar O_EXCL + PID
+                        use_os_lock = False
+                        continue
+                elif self._try_fallback_lock():
+                    os.close(fd); fd = None; break
+                contended = True
+                if time.perf_counter() - start >= self.timeout:
+                    self.wait_seconds = time.perf_counter() - start
+                    _record_wait(self.wait_seconds, contended, timed_out=True)
+                    raise TimeoutError(errno.ETIMEDOUT, f"Timeout ({self.timeout}s) esperando lock {self.tag}", self.path)
+                time.sleep(delay)
+                delay = min(delay * 2, _POLL_MAX_SECONDS)
+        except BaseException:
+            if fd is not None and self._fd is None: os.close(fd)
+            raise
+        self.wait_seconds = time.perf_counter() - start
+        _record_wait(self.wait_seconds, contended)
+        return self
+
+    def try_acquire(self):
+        # Un solo intento sin esperar (eleccion de lider): True si el lock queda adquirido.
+        # No cuenta en las metricas de lock_*, que miden la espera de los accesos al schedule.
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if _try_os_lock(fd, self.shared):
+                self._fd = fd; return True
+        except OSError:
+            os.close(fd)
+            return self._try_fallback_lock()
+        os.close(fd)
+        return False
+
+    def _try_fallback_lock(self):
+        fallback_path = self.path + ".excl"
+        try:
+            fd = os.open(fallback_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(fallback_path, 'r') as lf: owner_pid = int(lf.read().split()[0])
+            except (OSError, ValueError, IndexError): return False # Recien creado, aun sin PID
+            if owner_pid != os.getpid() and not pid_alive(owner_pid):
+                try: os.remove(fallback_path) # Lock caducado: su proceso ya no existe
+                except OSError: pass
+            return False
+        with os.fdopen(fd, 'w') as lf: lf.write(f"{os.getpid()} {self.tag}")
+        self._fallback_path = fallback_path
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            try: _os_unlock(self._fd)
+            finally:
+                os.close(self._fd); self._fd = None
+        if self._fallback_path is not None:
+            try: os.remove(self._fallback_path)
+            except OSError: pass
+            self._fallback_path = None
+
+    def __enter__(self): return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb): self.release()
@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+import time
+import atexit
+import threading
+
+# --- Logging compartido: cola + hilo escritor ---
+# log_message() solo clasifica el nivel (por el prefijo "INFO:", "WARN:", ...), descarta repetidos y
+# encola; un hilo (QueueListener) escribe en consola y, si se configura, en un fichero rotado.
+# 'logging' se importa al primer mensaje: las acciones rapidas sin consola no lo cargan.
+LOG_LEVEL = os.environ.get("TEMPODEL_LOG_LEVEL", "INFO").upper() # DEBUG muestra tambien el detalle por item
+LOG_MAX_BYTES = 5 * 1024 * 1024 # Rotacion por tamaño del fichero de log...
+LOG_BACKUP_COUNT = 5
+LOG_ROTATE_WHEN = os.environ.get("TEMPODEL_LOG_ROTATE", "").strip() # ...o por tiempo ("midnight", "h", ...)
+DEDUPE_WINDOW_SECONDS = 300 # Un WARN/ERROR identico dentro de esta ventana no se repite, solo se cuenta
+DEDUPE_MAX_KEYS = 2048
+LOG_FORMAT = "%(asctime)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_LEVEL_PREFIX = re.compile(r"\s*(?:¡+\s*)?(DEBUG|INFO|SUCCESS|WARN(?:ING)?|ERROR)\b", re.IGNORECASE)
+_LEVELS = {"DEBUG": 10, "INFO": 20, "SUCCESS": 20, "WARN": 30, "WARNING": 30, "ERROR": 40}
+_THRESHOLD = _LEVELS.get(LOG_LEVEL, 20)
+
+_guard = threading.Lock()
+_logger = None
+_listener = None
+_log_file = None
+_recent = {} # mensaje -> [primera vez (monotonic), repeticiones suprimidas]
+
+def message_level(message):
+    match = _LEVEL_PREFIX.match(message)
+    return _LEVELS[match.group(1).upper()] if match else 20
+
+def _build_handlers(log_file, console):
+    import logging
+    import logging.handlers
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = []
+    if console and sys.stdout is not None: handlers.append(logging.StreamHandler(sys.stdout))
+    if log_file:
+        if LOG_ROTATE_WHEN:
+            handlers.append(logging.handlers.TimedRotatingFileHandler(log_file, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+                                                                      encoding='utf-8', delay=True))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                                 encoding='utf-8', delay=True))
+    for handler in handlers: handler.setFormatter(formatter)
+    return handlers
+
+def _start(log_file, console):
+    # Con _guard tomado. Sustituye el escritor actual (si lo hay) por uno con los handlers pedidos.
+    global _logger, _listener, _log_file
+    import queue
+    import logging
+    import logging.handlers
+    if _listener is not None: _listener.stop() # Vacia la cola antes de cambiar de handlers
+    log_queue = queue.SimpleQueue()
+    _logger = logging.getLogger("tempodel")
+    _logger.propagate = False
+    _logger.setLevel(logging.DEBUG) # El umbral se aplica antes, en log_message
+    for handler in list(_logger.handlers): _logger.removeHandler(handler)
+    _logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *_build_handlers(log_file, console))
+    _listener.start()
+    _log_file = log_file
+
+def configure_logging(log_file=None, console=True):
+    # El checker llama a esto al arrancar con su fichero de log; sin llamarlo, solo consola
+    with _guard: _start(log_file, console)
+
+def shutdown_logging():
+    # Escribe lo que quede en la cola (tambien se llama al salir del interprete)
+    global _listener
+    with _guard:
+        if _listener is not None:
+            _listener.stop(); _listener = None
+
+atexit.register(shutdown_logging)
+
+def _dedupe(message, now):
+    # Devuelve el texto a escribir o None si es un repetido dentro de la ventana
+    with _guard:
+        entry = _recent.get(message)
+        if entry is not None and now - entry[0] < DEDUPE_WINDOW_SECONDS:
+            entry[1] += 1
+            return None
+        if len(_recent) >= DEDUPE_MAX_KEYS:
+            for key in [k for k, (first, _) in _recent.items() if now - first >= DEDUPE_WINDOW_SECONDS]: del _recent[key]
+            if len(_recent) >= DEDUPE_MAX_KEYS: _recent.clear()
+        _recent[message] = [now, 0]
+    if entry is not None and entry[1]:
+        return f"{message} (repetido {entry[1]} veces en los ultimos {now - entry[0]:.0f}s)"
+    return message
+
+def log_message(message):
+    level = message_level(message)
+    if level < _THRESHOLD: return
+    if _listener is None:
+        if sys.stdout is None: return # pythonw (menu contextual) sin fichero de log: no hay donde escribir
+        with _guard:
+            if _listener is None: _start(None, True)
+    if level >= 30:
+        message = _dedupe(message, time.monotonic())
+        if message is None: return
+    _logger.log(level, message)
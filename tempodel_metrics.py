@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# --- Metricas del proceso (contadores, gauges, histogramas y spans por fase) ---
+# Todo en memoria y con un solo lock: registrar una medida cuesta microsegundos. El lider del motor
+# vuelca snapshot() a METRICS_FILE cada cierto tiempo, y el checker lo sirve por la API local (op 'metrics').
+# Sin dependencias ni imports pesados: lo importa tempodel_lock, que usan hasta las acciones rapidas.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_FILE = os.path.join(os.environ.get("TEMPODEL_DATA_DIR") or SCRIPT_DIR, "tempodel_metrics.json")
+# Limites superiores de los buckets (segundos); el ultimo bucket es +inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TRACE_ENABLED = os.environ.get("TEMPODEL_TRACE", "").strip() not in ("", "0") # Guardar los ultimos spans, no solo su histograma
+TRACE_MAX_SPANS = 200
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0; self.total = 0.0
+        self.min = None; self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1; self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        # Estimacion por buckets: limite superior del bucket donde cae el percentil (acotado por max)
+        if not self.count: return None
+        rank = q * self.count; seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank: return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "min": self.min, "max": self.max,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": {str(bound): n for bound, n in zip(self.bounds + ("+inf",), self.counts) if n}}
+
+class MetricsRegistry:
+    def __init__(self):
+        self._guard = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.spans = deque(maxlen=TRACE_MAX_SPANS)
+
+    def inc(self, name, value=1):
+        with self._guard: self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._guard: self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self._guard:
+            histogram = self.histograms.get(name)
+            if histogram is None: histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        # Mide una fase: histograma '<name>_seconds' y, con TEMPODEL_TRACE, el span en la lista de recientes
+        start_wall = time.time(); start = time.perf_counter()
+        try: yield attributes # El bloque puede añadir atributos (p.ej. cuantos items proceso)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(name + "_seconds", elapsed)
+            if TRACE_ENABLED:
+                with self._guard:
+                    self.spans.append(dict(attributes, name=name, start=start_wall, seconds=elapsed, thread=threading.current_thread().name))
+
+    def counter(self, name):
+        with self._guard: return self.counters.get(name, 0)
+
+    def histogram(self, name):
+        with self._guard:
+            histogram = self.histograms.get(name)
+            return histogram.to_dict() if histogram is not None else None
+
+    def snapshot(self):
+        with self._guard:
+            data = {"pid": os.getpid(), "process": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+                    "timestamp": time.time(), "uptime_seconds": time.time() - self.started,
+                    "counters": dict(self.counters), "gauges": dict(self.gauges),
+                    "histograms": {name: h.to_dict() for name, h in self.histograms.items()}}
+            if TRACE_ENABLED: data["spans"] = list(self.spans)
+        return data
+
+REGISTRY = MetricsRegistry()
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+span = REGISTRY.span
+snapshot = REGISTRY.snapshot
+
+def write_snapshot(path=METRICS_FILE):
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f: json.dump(snapshot(), f, indent=1)
+        os.replace(temp_path, path)
+        return True
+    except OSError:
+        return False
+
+def read_metrics():
+    # Metricas del checker en marcha (API local) o, si no responde, el ultimo snapshot en disco
+    from tempodel_ipc import call, IpcUnavailable
+    try: return call('metrics')
+    except (IpcUnavailable, RuntimeError): pass
+    try:
+        with open(METRICS_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+if __name__ == "__main__":
+    metrics = read_metrics()
+    if metrics is None:
+        print(f"No hay metricas: el checker no esta corriendo y no existe {METRICS_FILE}."); sys.exit(1)
+    print(json.dumps(metrics, indent=2, ensure_ascii=False))
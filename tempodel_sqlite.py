@@ -0,0 +1,229 @@
+import json
+import os
+import sys
+import sqlite3
+import time
+import threading
+import traceback
+
+from tempodel_log import log_message
+import tempodel_store
+
+# --- Backend SQLite opcional del schedule (TEMPODEL_STORE=sqlite) ---
+# Misma API que tempodel_store (load/save/registros add/remove/reschedule), con un indice
+# sobre delete_at para preguntar "que toca borrar" y un indice unico sobre el path normalizado.
+SCHEDULE_DB_FILE = os.path.join(tempodel_store.DATA_DIR, "schedule.db")
+BUSY_TIMEOUT_MS = 5000
+KNOWN_COLUMNS = ('path', 'delete_at', 'is_dir', 'periodic', 'original_duration_seconds')
+
+_local = threading.local() # Una conexion por hilo (la GUI usa el store desde varios hilos)
+
+def _create_schema(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS schedule (
+            id INTEGER PRIMARY KEY,
+            norm_path TEXT NOT NULL,
+            path TEXT NOT NULL,
+            delete_at REAL NOT NULL,
+            is_dir INTEGER NOT NULL,
+            periodic INTEGER NOT NULL DEFAULT 0,
+            original_duration_seconds REAL,
+            extra TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_norm_path ON schedule(norm_path);
+        CREATE INDEX IF NOT EXISTS idx_schedule_delete_at ON schedule(delete_at);
+    """)
+
+def get_connection():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None: return conn
+    is_new_db = not os.path.exists(SCHEDULE_DB_FILE)
+    conn = sqlite3.connect(SCHEDULE_DB_FILE, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _create_schema(conn)
+    _local.conn = conn
+    if is_new_db and _has_json_schedule():
+        migrate_from_json()
+    return conn
+
+# --- Conversion fila <-> item ---
+def _valid_items(items):
+    # Los items con delete_at no numerico no se guardan (tomarlos como 0 los borraria en seguida)
+    for item in items:
+        if tempodel_store.is_valid_item(item): yield item
+        elif item is not None: tempodel_store.warn_invalid_item(item)
+
+def _row_values(item):
+    # Solo items validos (ver _valid_items): delete_at ya es un numero
+    if isinstance(item, tempodel_store.ScheduleItem): item = item.to_dict()
+    extra = {k: v for k, v in item.items() if k not in KNOWN_COLUMNS}
+    duration = item.get('original_duration_seconds')
+    try: duration = float(duration) if duration is not None else None
+    except (TypeError, ValueError): duration = None
+    path = os.path.normpath(item['path'])
+    return (path, path, tempodel_store.delete_at_of(item), 1 if item['is_dir'] else 0,
+            1 if item.get('periodic', False) else 0, duration, json.dumps(extra, ensure_ascii=False) if extra else None)
+
+def _row_to_item(row):
+    # La base de datos ya guarda el path normalizado: no hace falta pasar por from_dict
+    path, delete_at, is_dir, periodic, duration, extra = row
+    if extra:
+        try: extra = json.loads(extra) or None
+        except ValueError: extra = None
+    return tempodel_store.ScheduleItem(path, delete_at, bool(is_dir), bool(periodic),
+                                       duration if duration is None or duration > 0 else None, extra)
+
+_SELECT_ITEMS = "SELECT path, delete_at, is_dir, periodic, original_duration_seconds, extra FROM schedule"
+_UPSERT = """
+    INSERT INTO schedule (norm_path, path, delete_at, is_dir, periodic, original_duration_seconds, extra)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(norm_path) DO UPDATE SET
+        path = excluded.path, delete_at = excluded.delete_at, is_dir = excluded.is_dir,
+        periodic = excluded.periodic, original_duration_seconds = excluded.original_duration_seconds,
+        extra = excluded.extra
+"""
+
+# --- API equivalente a tempodel_store ---
+def load_items():
+    return [_row_to_item(row) for row in get_connection().execute(_SELECT_ITEMS + " ORDER BY id")]
+
+def load_schedule():
+    return [item.to_dict() for item in load_items()]
+
+def save_schedule(schedule):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM schedule")
+        conn.executemany(_UPSERT, [_row_values(item) for item in _valid_items(schedule)])
+    return True
+
+def apply_records(records):
+    # Aplica registros con el mismo formato que el journal JSON, todos en una transaccion
+    conn = get_connection()
+    with conn:
+        for record in records:
+            op = record.get('op')
+            if op == 'add':
+                for item in _valid_items([record.get('item')]): conn.execute(_UPSERT, _row_values(item))
+                continue
+            if not isinstance(record.get('path'), str): continue
+            path = os.path.normpath(record['path'])
+            condition = ""; params = [path]
+            if record.get('if_delete_at') is not None:
+                condition = " AND delete_at = ?"; params.append(float(record['if_delete_at']))
+            if op == 'remove':
+                conn.execute("DELETE FROM schedule WHERE norm_path = ?" + condition, params)
+            elif op == 'reschedule':
+                conn.execute("UPDATE schedule SET delete_at = ? WHERE norm_path = ?" + condition, [float(record['delete_at'])] + params)
+    return True
+
+def due_items(now, limit=None):
+    query = _SELECT_ITEMS + " WHERE delete_at <= ? ORDER BY delete_at"
+    params = [now]
+    if limit is not None: query += " LIMIT ?"; params.append(int(limit))
+    return [_row_to_item(row) for row in get_connection().execute(query, params)]
+
+def next_due_time():
+    return get_connection().execute("SELECT MIN(delete_at) FROM schedule").fetchone()[0]
+
+def count_due(now):
+    return get_connection().execute("SELECT COUNT(*) FROM schedule WHERE delete_at <= ?", (now,)).fetchone()[0]
+
+def count_items():
+    return get_connection().execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+
+def iter_items():
+    for row in get_connection().execute(_SELECT_ITEMS):
+        item = _row_to_item(row)
+        yield item.path, item
+
+class SqliteReader:
+    # Con SQLite la base de datos es la fuente de verdad: no hay estado que reconstruir en memoria
+    def __init__(self):
+        self.items = {}
+
+    def refresh(self):
+        return set()
+
+class SqliteDueScheduler:
+    # Mismo interfaz que DueScheduler del checker, pero las consultas van contra el indice de delete_at.
+    # upsert/remove no hacen nada: los cambios llegan a la base de datos via apply_records. Mientras esa
+    # escritura falle, 'unsaved' (path -> (delete_at procesado, item nuevo o None), el _unsaved_changes
+    # del motor) tapa las filas viejas: un item ya borrado no vuelve a salir como 'due' en cada pasada.
+    # Los items aplazados (volumen no disponible) solo se recuerdan en memoria.
+    def __init__(self, unsaved=None):
+        self._deferred = {} # path -> time.time() a partir del cual vuelve a ser 'due'
+        self._unsaved = unsaved if unsaved is not None else {}
+
+    def __len__(self): return count_items()
+    def upsert(self, item): self._deferred.pop(item.path, None)
+    def remove(self, path): self._deferred.pop(os.path.normpath(path), None)
+    def defer(self, item, until): self._deferred[item.path] = until
+    def sync(self, schedule): return 0
+    def sync_paths(self, items, paths): pass
+
+    def _hidden(self, now):
+        # path -> momento en que vuelve a ser 'due' (None: fuera del schedule en cuanto se guarde)
+        for path in [p for p, until in self._deferred.items() if until <= now]: del self._deferred[path]
+        hidden = dict(self._deferred)
+        for path, (_, new_item) in self._unsaved.items():
+            hidden[path] = new_item.delete_at if new_item is not None else None
+        return hidden
+
+    def next_due_time(self):
+        hidden = self._hidden(time.time())
+        if not hidden: return next_due_time()
+        pending = [until for until in hidden.values() if until is not None]
+        for path, delete_at in get_connection().execute("SELECT norm_path, delete_at FROM schedule ORDER BY delete_at"):
+            if path not in hidden: return min([delete_at] + pending)
+        return min(pending) if pending else None
+
+    def pop_due(self, now, limit=None):
+        hidden = self._hidden(now)
+        if not hidden: return due_items(now, limit)
+        due = []
+        for row in get_connection().execute(_SELECT_ITEMS + " WHERE delete_at <= ? ORDER BY delete_at", (now,)):
+            if limit is not None and len(due) >= limit: break
+            if row[0] not in hidden: due.append(_row_to_item(row))
+        return due
+
+    def count_due(self, now): return max(count_due(now) - len(self._hidden(now)), 0)
+
+    def iter_items(self):
+        items = []
+        for path, item in iter_items():
+            if path in self._unsaved:
+                item = self._unsaved[path][1]
+                if item is None: continue
+            items.append((path, item))
+        return items
+
+# --- Migracion desde schedule.json ---
+def _has_json_schedule():
+    # Antes de la primera compactacion el estado JSON puede estar solo en el journal
+    return any(os.path.exists(path) for path in tempodel_store._snapshot_files() + [tempodel_store.JOURNAL_FILE])
+
+def migrate_from_json():
+    # Importa los shards/schedule.json (+ journal pendiente) una sola vez y los renombra a *.migrated
+    try:
+        items, _, _ = tempodel_store._load_state()
+        schedule = list(items.values())
+        conn = get_connection()
+        with conn:
+            conn.executemany(_UPSERT, [_row_values(item) for item in schedule])
+        for path in tempodel_store._snapshot_files() + [tempodel_store.JOURNAL_FILE]:
+            if os.path.exists(path): os.replace(path, path + ".migrated")
+        log_message(f"INFO: Migrados {len(schedule)} items de schedule.json a {SCHEDULE_DB_FILE}.")
+        return len(schedule)
+    except Exception as e:
+        log_message(f"ERROR: Migrando schedule.json a SQLite: {e}\n{traceback.format_exc()}")
+        return -1
+
+if __name__ == "__main__":
+    if "--migrate" in sys.argv[1:]:
+        get_connection()
+        if _has_json_schedule(): migrate_from_json()
+        log_message(f"INFO: {count_items()} items en {SCHEDULE_DB_FILE}.")
+    else:
+        print("Uso: python tempodel_sqlite.py --migrate")
@@ -0,0 +1,623 @@
+import re
+import json
+import math
+import os
+import sys
+import hashlib
+import time
+import struct
+from array import array
+import datetime
+import traceback
+from contextlib import contextmanager
+
+from tempodel_log import log_message
+from tempodel_lock import FileLock, SLOW_LOCK_WARN_SECONDS
+import tempodel_metrics as metrics
+
+try:
+    import orjson # Opcional: codec JSON mas rapido si esta instalado
+except ImportError:
+    orjson = None
+
+# --- Almacenamiento del schedule: snapshot + journal ---
+# El snapshot esta repartido en shards (schedule.shards/), uno por volumen o raiz configurada.
+# Cada alta/baja/reprogramacion se añade como una linea JSON a schedule.journal, y el journal se
+# compacta de vez en cuando reescribiendo solo los shards que tocaron sus registros. Asi una
+# modificacion cuesta una escritura O(1) en disco. Un schedule.json de antes de los shards se
+# sigue leyendo, y se reparte en shards en la primera compactacion.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("TEMPODEL_DATA_DIR") or SCRIPT_DIR # Carpeta del schedule (tempodel_bench.py usa una temporal)
+SCHEDULE_FILE = os.path.join(DATA_DIR, "schedule.json")
+JOURNAL_FILE = os.path.join(DATA_DIR, "schedule.journal")
+GENERATION_FILE = SCHEDULE_FILE + ".gen" # Se incrementa en cada reescritura del snapshot
+LOCK_FILE = SCHEDULE_FILE + ".lock" # Fichero permanente sobre el que se toman los locks
+SHARD_DIR = os.path.join(DATA_DIR, "schedule.shards")
+SHARD_ROOTS_FILE = os.path.join(SHARD_DIR, "roots.txt") # Raices con las que se repartieron los shards
+# Raices que forman su propio shard aunque esten en el mismo volumen (p.ej. puntos de montaje en
+# Linux o carpetas de red concretas), separadas por os.pathsep. Si no, el shard es la unidad o recurso UNC.
+SHARD_ROOTS = sorted(((os.path.normcase(os.path.normpath(r.strip())), os.path.normpath(r.strip()))
+                      for r in os.environ.get("TEMPODEL_SHARD_ROOTS", "").split(os.pathsep) if r.strip()),
+                     key=lambda root: len(root[0]), reverse=True)
+COMPACT_MIN_BYTES = 256 * 1024 # Compactar cuando el journal supere esto y el tamaño del snapshot
+REQUIRED_KEYS = ('path', 'delete_at', 'is_dir')
+JOURNAL_OPS = ('add', 'remove', 'reschedule')
+STORE_BACKEND = os.environ.get("TEMPODEL_STORE", "json").strip().lower() # "json" (snapshot + journal) o "sqlite"
+# Formato con el que se reescribe el snapshot: "json" (compacto), "pretty" (indentado, para editarlo
+# a mano) o "columnar" (binario por columnas). Al leer se detecta solo, sea cual sea este valor.
+SNAPSHOT_FORMAT = os.environ.get("TEMPODEL_SNAPSHOT_FORMAT", "json").strip().lower()
+COLUMNAR_MAGIC = b"TEMPODEL-COL1\n"
+
+def _sqlite_backend():
+    import tempodel_sqlite # Solo se carga sqlite3 si se usa este backend
+    return tempodel_sqlite
+
+def watched_files():
+    # Ficheros cuyo cambio indica que el schedule ha cambiado
+    if STORE_BACKEND == "sqlite":
+        db_file = _sqlite_backend().SCHEDULE_DB_FILE
+        return [db_file, db_file + "-wal"]
+    return [SCHEDULE_FILE, JOURNAL_FILE]
+
+@contextmanager
+def _schedule_lock(tag, shared=False):
+    # Lectores en modo compartido, escritores en exclusivo (ver tempodel_lock)
+    with FileLock(LOCK_FILE, shared=shared, tag=tag) as lock:
+        if lock.wait_seconds >= SLOW_LOCK_WARN_SECONDS:
+            log_message(f"WARN: Esperados {lock.wait_seconds:.2f}s por el lock del schedule ({tag}).")
+        yield
+
+def _parse_delete_at(value):
+    # delete_at como float, o None si no es un numero (p.ej. una fecha escrita a mano en el JSON)
+    try: value = float(value)
+    except (TypeError, ValueError): return None
+    return value if math.isfinite(value) else None
+
+def is_valid_item(item):
+    # Un delete_at que no es un numero invalida el item: nunca se toma como 0 (eso lo borraria ya)
+    if isinstance(item, ScheduleItem): return True
+    return (isinstance(item, dict) and all(k in item for k in REQUIRED_KEYS) and isinstance(item.get('path'), str)
+            and _parse_delete_at(item['delete_at']) is not None)
+
+def warn_invalid_item(item):
+    path = item.get('path') if isinstance(item, dict) else None
+    log_message(f"WARN: Item invalido en el schedule (delete_at {item.get('delete_at')!r}, path {path!r}). Se ignora."
+                if path is not None else f"WARN: Entrada invalida en el schedule ({str(item)[:200]}). Se ignora.")
+
+def delete_at_of(item):
+    # Solo para items validos (is_valid_item)
+    if isinstance(item, ScheduleItem): return item.delete_at
+    return float(item['delete_at'])
+
+class ScheduleItem:
+    # Registro compacto de un item en memoria (sin el dict por instancia). El path se normaliza y los
+    # campos se convierten una sola vez al cargarlo; las claves que no conocemos se guardan en 'extra'
+    # para no perderlas al reescribir. En disco y en la API publica sigue siendo un dict (to_dict).
+    __slots__ = ('path', 'delete_at', 'is_dir', 'periodic', 'duration', 'extra')
+    _KNOWN_KEYS = frozenset(('path', 'delete_at', 'is_dir', 'periodic', 'original_duration_seconds'))
+
+    def __init__(self, path, delete_at, is_dir=False, periodic=False, duration=None, extra=None):
+        self.path = path # Ya normalizado
+        self.delete_at = delete_at
+        self.is_dir = is_dir
+        self.periodic = periodic
+        self.duration = duration # original_duration_seconds (float > 0) o None
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        # None si el dict no es un item valido
+        if not is_valid_item(data):
+            if data is not None: warn_invalid_item(data)
+            return None
+        duration = data.get('original_duration_seconds')
+        if duration is not None:
+            try:
+                duration = float(duration)
+                if duration <= 0: duration = None # Duración debe ser positiva
+            except (TypeError, ValueError): duration = None
+        extra = None
+        if len(data) > 4 or 'periodic' not in data: # Solo entonces puede haber claves desconocidas
+            extra = {k: v for k, v in data.items() if k not in cls._KNOWN_KEYS} or None
+        return cls(os.path.normpath(data['path']), delete_at_of(data), bool(data['is_dir']),
+                   bool(data.get('periodic', False)), duration, extra)
+
+    def to_dict(self):
+        data = dict(self.extra) if self.extra else {}
+        data.update(path=self.path, delete_at=self.delete_at, is_dir=self.is_dir, periodic=self.periodic)
+        if self.duration is not None: data['original_duration_seconds'] = self.duration
+        return data
+
+    @property
+    def rule(self):
+        # Regla de retencion (dict, ver make_rule_item) o None si es un item normal
+        return self.extra.get('rule') if self.extra else None
+
+    @property
+    def max_bytes(self):
+        # Tope de tamaño de una carpeta periodica (ver make_item) o None
+        return self.extra.get('max_bytes') if self.extra else None
+
+    def rescheduled(self, delete_at):
+        return ScheduleItem(self.path, delete_at, self.is_dir, self.periodic, self.duration, self.extra)
+
+    def _key(self): return (self.path, self.delete_at, self.is_dir, self.periodic, self.duration, self.extra)
+
+    def __eq__(self, other):
+        return isinstance(other, ScheduleItem) and self._key() == other._key()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ScheduleItem({self.path!r}, delete_at={self.delete_at}, is_dir={self.is_dir}, periodic={self.periodic}, duration={self.duration})"
+
+def read_generation():
+    try:
+        with open(GENERATION_FILE, 'r') as gf: return int(gf.read().strip() or 0)
+    except (OSError, ValueError): return 0
+
+def _bump_generation():
+    generation = read_generation() + 1
+    try:
+        with open(GENERATION_FILE, 'w') as gf: gf.write(str(generation))
+    except OSError as e: log_message(f"WARN: No se pudo actualizar el contador de generacion: {e}")
+
+# --- Codec JSON (orjson si esta disponible) ---
+def _json_dumps(data):
+    if orjson is not None:
+        try: return orjson.dumps(data)
+        except TypeError: pass # p.ej. enteros fuera de 64 bits: que lo haga json
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _json_loads(data):
+    if orjson is not None:
+        try: return orjson.loads(data)
+        except ValueError: pass # p.ej. BOM de UTF-8 de un fichero editado a mano
+    return json.loads(data)
+
+# --- Formato columnar ---
+# MAGIC, cabecera '<II' (n items, bytes de paths), paths UTF-8 separados por '\0', delete_at (n doubles),
+# duracion (n doubles, NaN = sin duracion), flags (n bytes: 1 = is_dir, 2 = periodic) y al final
+# '<I' + JSON {indice: claves extra} solo de los items que las tengan. Todo little-endian.
+def _le_bytes(values):
+    if sys.byteorder == 'big': values.byteswap()
+    return values.tobytes()
+
+def _le_array(typecode, data):
+    values = array(typecode); values.frombytes(data)
+    if sys.byteorder == 'big': values.byteswap()
+    return values
+
+def _encode_columnar(items):
+    paths = '\0'.join(item.path for item in items).encode('utf-8')
+    delete_at = array('d', (item.delete_at for item in items))
+    durations = array('d', (math.nan if item.duration is None else item.duration for item in items))
+    flags = array('B', ((1 if item.is_dir else 0) | (2 if item.periodic else 0) for item in items))
+    extras = _json_dumps({str(i): item.extra for i, item in enumerate(items) if item.extra})
+    return b''.join((COLUMNAR_MAGIC, struct.pack('<II', len(items), len(paths)), paths,
+                     _le_bytes(delete_at), _le_bytes(durations), flags.tobytes(), struct.pack('<I', len(extras)), extras))
+
+def _decode_columnar(data):
+    offset = len(COLUMNAR_MAGIC)
+    count, paths_size = struct.unpack_from('<II', data, offset); offset += 8
+    paths = data[offset:offset + paths_size].decode('utf-8').split('\0') if count else []; offset += paths_size
+    delete_at = _le_array('d', data[offset:offset + 8 * count]); offset += 8 * count
+    durations = _le_array('d', data[offset:offset + 8 * count]); offset += 8 * count
+    flags = data[offset:offset + count]; offset += count
+    extras_size, = struct.unpack_from('<I', data, offset); offset += 4
+    extras = _json_loads(data[offset:offset + extras_size]) if extras_size else {}
+    if not (len(paths) == len(delete_at) == len(durations) == len(flags) == count) or offset + extras_size != len(data):
+        raise ValueError("snapshot columnar truncado")
+    # Escrito por _write_snapshot a partir de ScheduleItem ya validados: no hace falta revalidar
+    return [ScheduleItem(path, when, bool(flag & 1), bool(flag & 2), None if math.isnan(duration) else duration,
+                         extras.get(str(i)) if extras else None)
+            for i, (path, when, duration, flag) in enumerate(zip(paths, delete_at, durations, flags))]
+
+# --- Shards ---
+def shard_key(path):
+    # Shard de un path. Solo mira el texto, sin tocar el disco: el volumen puede estar caido.
+    folded = os.path.normcase(path)
+    for folded_root, root in SHARD_ROOTS:
+        if folded == folded_root or folded.startswith(folded_root.rstrip(os.sep) + os.sep): return root
+    drive = os.path.splitdrive(path)[0]
+    return drive.upper() if drive else os.sep
+
+def shard_root(key):
+    # Directorio que se sondea para saber si el shard esta accesible
+    return key if key.endswith(os.sep) else key + os.sep
+
+def shard_file(key):
+    slug = re.sub(r'[^0-9A-Za-z]+', '_', key).strip('_')[:40] or "root"
+    return os.path.join(SHARD_DIR, f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}.json")
+
+def _snapshot_files():
+    # schedule.json (formato sin shards) primero: si un path estuviera en ambos, mandan los shards
+    try: names = sorted(name for name in os.listdir(SHARD_DIR) if name.endswith('.json'))
+    except OSError: names = []
+    return [SCHEDULE_FILE] + [os.path.join(SHARD_DIR, name) for name in names]
+
+def _shard_roots_changed():
+    # True si TEMPODEL_SHARD_ROOTS no es el mismo con el que se repartieron los shards
+    try:
+        with open(SHARD_ROOTS_FILE, 'r', encoding='utf-8') as f: return f.read() != os.pathsep.join(r for _, r in SHARD_ROOTS)
+    except OSError: return True
+
+# --- Snapshot ---
+_snapshot_cache = {} # fichero -> (firma, [ScheduleItem]) de la ultima carga en este proceso
+
+def _read_snapshot(path):
+    # Lista de ScheduleItem de un fichero. El formato (JSON o columnar) se detecta por la cabecera.
+    try:
+        with open(path, 'rb') as f: data = f.read()
+        if data.startswith(COLUMNAR_MAGIC): return _decode_columnar(data)
+        loaded_data = _json_loads(data)
+    except FileNotFoundError: return []
+    except (IOError, TypeError, ValueError, struct.error) as e:
+        # Se aparta en lugar de sobrescribirlo: solo se pierde (de momento) ese shard
+        log_message(f"ERROR: Cargando schedule ({path}): {e}. Se renombra a .corrupt y se usa vacio.")
+        try: os.replace(path, path + ".corrupt")
+        except OSError: pass
+        return []
+    if not isinstance(loaded_data, list):
+        log_message(f"ERROR: {path} no contiene lista valida. Usando vacia.")
+        return []
+    # Un JSON puede haberse editado a mano: from_dict descarta lo que no sea un item valido
+    schedule = [item for item in map(ScheduleItem.from_dict, loaded_data) if item is not None]
+    if len(schedule) != len(loaded_data): log_message("WARN: Items malformados eliminados al cargar schedule.")
+    return schedule
+
+def _load_snapshots():
+    # dict path -> ScheduleItem con todos los shards. Solo se vuelven a leer los ficheros cuya firma
+    # (mtime, tamaño, inodo) cambio desde la ultima carga; los demas salen de la cache.
+    global _snapshot_cache
+    cache = {}; items = {}
+    for path in _snapshot_files():
+        try: st = os.stat(path)
+        except OSError: continue
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = _snapshot_cache.get(path)
+        loaded = cached[1] if cached is not None and cached[0] == signature else _read_snapshot(path)
+        cache[path] = (signature, loaded)
+        for item in loaded: items[item.path] = item
+    if not cache: log_message("INFO: schedule.json no existe. Se creara uno vacio si es necesario.")
+    _snapshot_cache = cache
+    return items
+
+def _write_snapshot(path, items):
+    if SNAPSHOT_FORMAT == "columnar": data = _encode_columnar(items)
+    elif SNAPSHOT_FORMAT == "pretty": data = json.dumps([item.to_dict() for item in items], indent=4, ensure_ascii=False).encode('utf-8')
+    else: data = _json_dumps([item.to_dict() for item in items])
+    temp_schedule_path = path + ".tmp"
+    try:
+        with open(temp_schedule_path, 'wb') as f: f.write(data)
+        os.replace(temp_schedule_path, path)
+    except (IOError, TypeError, ValueError, OSError):
+        if os.path.exists(temp_schedule_path):
+            try: os.remove(temp_schedule_path)
+            except OSError: pass
+        raise
+
+# --- Journal ---
+def _journal_header(generation):
+    return (json.dumps({"journal": 1, "generation": generation}) + "\n").encode('utf-8')
+
+def trim_torn_tail(f):
+    # Con el lock de escritura tomado y 'f' abierto en 'a+b'. Si un escritor murio a mitad de append, la
+    # ultima linea queda sin '\n' y el siguiente registro se pegaria a ella (y se perderia al leer):
+    # se recorta hasta el ultimo '\n'. Devuelve los bytes recortados. Los lectores nunca avanzan mas alla
+    # de un '\n', asi que recortar no invalida sus offsets.
+    end = f.seek(0, os.SEEK_END)
+    if end == 0: return 0
+    f.seek(end - 1)
+    if f.read(1) == b"\n": return 0
+    position = end - 1
+    while position > 0:
+        start = max(0, position - 4096)
+        f.seek(start)
+        newline = f.read(position - start).rfind(b"\n")
+        if newline >= 0:
+            position = start + newline + 1
+            break
+        position = start
+    f.truncate(position)
+    f.seek(0, os.SEEK_END)
+    return end - position
+
+def _read_journal(offset=0, expected_generation=None):
+    # Lee los registros completos a partir de 'offset'. Devuelve (generation, registros, nuevo offset);
+    # registros es None si el journal fue compactado (otra generacion) y hay que recargar entero.
+    try: jf = open(JOURNAL_FILE, 'rb')
+    except FileNotFoundError: return 0, ([] if expected_generation in (None, 0) else None), 0
+    with jf:
+        header_line = jf.readline()
+        try: generation = int(json.loads(header_line).get('generation', 0))
+        except (ValueError, AttributeError, TypeError): generation = 0
+        if expected_generation is not None and generation != expected_generation:
+            return generation, None, 0
+        offset = max(offset, len(header_line))
+        jf.seek(offset)
+        data = jf.read()
+    end = data.rfind(b'\n') + 1 # Una linea sin '\n' final aun se esta escribiendo
+    records = []
+    for raw_line in data[:end].splitlines():
+        if not raw_line.strip(): continue
+        try: record = _json_loads(raw_line)
+        except ValueError:
+            log_message(f"WARN: Registro corrupto en el journal ignorado: {raw_line[:200]!r}")
+            continue
+        if isinstance(record, dict) and record.get('op') in JOURNAL_OPS: records.append(record)
+    return generation, records, offset + end
+
+def _apply_record(items, record):
+    # Aplica un registro del journal sobre el dict path -> item. Devuelve el path afectado o None.
+    # Los registros son idempotentes: repetirlos sobre un snapshot ya compactado no cambia el resultado.
+    op = record.get('op')
+    if op == 'add':
+        item = ScheduleItem.from_dict(record.get('item'))
+        if item is None: return None
+        items[item.path] = item
+        return item.path
+    if not isinstance(record.get('path'), str): return None
+    path = os.path.normpath(record['path'])
+    current = items.get(path)
+    if current is None: return None
+    expected = record.get('if_delete_at') # Solo si nadie lo ha reprogramado mientras tanto
+    if expected is not None and current.delete_at != expected: return None
+    if op == 'remove':
+        del items[path]
+    elif op == 'reschedule':
+        try: new_delete_at = float(record['delete_at'])
+        except (KeyError, TypeError, ValueError): return None
+        items[path] = current.rescheduled(new_delete_at)
+    return path
+
+def _load_state(dirty_shards=None):
+    # dict path normalizado -> ScheduleItem (el indice por path se construye aqui, una vez).
+    # En dirty_shards (si se pasa) se añaden los shards que cambian los registros del journal.
+    with metrics.span("schedule_load") as span:
+        items = _load_snapshots()
+        generation, records, offset = _read_journal()
+        for record in records:
+            path = _apply_record(items, record)
+            if path is not None and dirty_shards is not None: dirty_shards.add(shard_key(path))
+        span.update(items=len(items), journal_records=len(records))
+    metrics.set_gauge("schedule_items", len(items))
+    return items, generation, offset
+
+def _write_compacted(schedule, dirty_shards=None):
+    # Reescribe los shards de dirty_shards (todos si es None) y vacia el journal.
+    # Se valida una vez aqui, al escribir: lo que llega a disco ya son items correctos y normalizados.
+    with metrics.span("schedule_save") as span:
+        shards = {}
+        for item in schedule:
+            if not isinstance(item, ScheduleItem): item = ScheduleItem.from_dict(item)
+            if item is not None: shards.setdefault(shard_file(shard_key(item.path)), []).append(item)
+        legacy = os.path.exists(SCHEDULE_FILE)
+        if dirty_shards is None or legacy or _shard_roots_changed():
+            targets = set(shards) | set(_snapshot_files()[1:]) # Tambien se borran los shards que quedaron vacios
+        else:
+            targets = {shard_file(key) for key in dirty_shards}
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        for path in targets:
+            if shards.get(path): _write_snapshot(path, shards[path])
+            elif os.path.exists(path): os.remove(path)
+        if _shard_roots_changed():
+            with open(SHARD_ROOTS_FILE, 'w', encoding='utf-8') as f: f.write(os.pathsep.join(r for _, r in SHARD_ROOTS))
+        if legacy:
+            os.replace(SCHEDULE_FILE, SCHEDULE_FILE + ".migrated")
+            log_message(f"INFO: schedule.json repartido en {len(shards)} shards en {SHARD_DIR}.")
+        _bump_generation()
+        temp_journal_path = JOURNAL_FILE + ".tmp"
+        with open(temp_journal_path, 'wb') as jf: jf.write(_journal_header(read_generation()))
+        os.replace(temp_journal_path, JOURNAL_FILE)
+        span.update(items=sum(map(len, shards.values())), shards_written=len(targets))
+
+def append_records(records):
+    if not records: return True
+    if STORE_BACKEND == "sqlite":
+        try: return _sqlite_backend().apply_records(records)
+        except Exception as e:
+            log_message(f"ERROR: Escribiendo schedule SQLite: {e}")
+            return False
+    payload = b''.join(_json_dumps(r) + b"\n" for r in records)
+    try:
+        with metrics.span("journal_append"), _schedule_lock("append"):
+            with open(JOURNAL_FILE, 'a+b') as jf:
+                torn = trim_torn_tail(jf)
+                if torn: log_message(f"WARN: Ultima linea del journal incompleta ({torn} bytes). Se descarta.")
+                if jf.tell() == 0: jf.write(_journal_header(read_generation()))
+                jf.write(payload)
+        metrics.inc("journal_records", len(records))
+    except OSError as e:
+        log_message(f"ERROR: Escribiendo journal ({JOURNAL_FILE}): {e}")
+        return False
+    maybe_compact()
+    return True
+
+def _journal_needs_compaction():
+    try: journal_size = os.path.getsize(JOURNAL_FILE)
+    except OSError: return 0
+    snapshot_size = 0
+    for path in _snapshot_files():
+        try: snapshot_size += os.path.getsize(path)
+        except OSError: pass
+    return journal_size if journal_size > max(COMPACT_MIN_BYTES, snapshot_size) else 0
+
+def maybe_compact():
+    if STORE_BACKEND == "sqlite": return False
+    journal_size = _journal_needs_compaction()
+    if not journal_size: return False
+    log_message(f"INFO: Compactando journal ({journal_size} bytes) en los shards del schedule.")
+    return compact_schedule(force=False)
+
+def compact_schedule(force=True):
+    try:
+        with _schedule_lock("compact"):
+            if not force and not _journal_needs_compaction(): return False # Otro proceso acaba de compactar
+            dirty_shards = set()
+            items, _, _ = _load_state(dirty_shards)
+            _write_compacted(list(items.values()), dirty_shards)
+        return True
+    except Exception as e:
+        log_message(f"ERROR: Compactando schedule: {e}\n{traceback.format_exc()}")
+        return False
+
+class ScheduleReader:
+    # Estado del schedule en memoria para procesos de larga duracion (checker).
+    # refresh() solo lee la cola nueva del journal; recarga todo si el journal fue compactado.
+    def __init__(self):
+        self.items = {} # path normalizado -> ScheduleItem
+        self.generation = None
+        self.offset = 0
+
+    def refresh(self):
+        # Devuelve el set de paths cambiados, o None si hubo recarga completa
+        if self.generation is not None:
+            generation, records, offset = _read_journal(self.offset, self.generation)
+            if records is not None:
+                self.offset = offset
+                return {path for path in (_apply_record(self.items, r) for r in records) if path}
+        try:
+            with _schedule_lock("load", shared=True):
+                self.items, self.generation, self.offset = _load_state()
+        except Exception as e:
+            log_message(f"ERROR: Excepcion inesperada recargando schedule: {e}\n{traceback.format_exc()}")
+        return None
+
+# --- API publica (GUI y checker) ---
+def load_items():
+    # Lista de ScheduleItem (paths ya normalizados)
+    try:
+        if STORE_BACKEND == "sqlite": return _sqlite_backend().load_items()
+        with _schedule_lock("load", shared=True):
+            items, _, _ = _load_state()
+        return list(items.values())
+    except Exception as e:
+        log_message(f"ERROR: Excepcion inesperada en load_schedule: {e}\n{traceback.format_exc()}")
+        return []
+
+def load_schedule():
+    # Lista de dicts, como siempre (IPC, clientes externos)
+    return [item.to_dict() for item in load_items()]
+
+def save_schedule(schedule):
+    # Reescritura completa: nuevo snapshot y journal vacio
+    try:
+        if STORE_BACKEND == "sqlite": return _sqlite_backend().save_schedule(schedule)
+        with _schedule_lock("save"):
+            _write_compacted(schedule)
+        return True
+    except Exception as e:
+        log_message(f"ERROR: Guardando schedule ({SCHEDULE_FILE}): {e}")
+        return False
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+def parse_size(text):
+    # "500M", "2G", "1.5T" o bytes -> int. ValueError si no se entiende.
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*", str(text), re.IGNORECASE)
+    if not match: raise ValueError(f"Tamaño invalido: {text!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024: return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def make_item(item_path, delete_timestamp, is_periodic_item=False, duration_for_periodic=None, max_bytes=None):
+    # Determinar is_dir. Para paths no existentes, esto será False.
+    # Esto es una limitación si se añade una carpeta periódica que aún no existe.
+    if not os.path.exists(item_path):
+        if not is_periodic_item: # Solo mostrar advertencia si no es periódico y no existe
+            log_message(f"WARN: Path no existe al añadir/actualizar item no periódico: {item_path}")
+        else:
+            log_message(f"INFO: Path para item periódico '{item_path}' no existe actualmente, pero se añadirá/actualizará.")
+    new_item_data = {
+        "path": os.path.normpath(item_path),
+        "delete_at": float(delete_timestamp),
+        "is_dir": os.path.isdir(item_path), # Usar el estado actual. Si no existe, será False.
+        "periodic": is_periodic_item
+    }
+    if is_periodic_item:
+        if duration_for_periodic is not None and float(duration_for_periodic) > 0:
+            new_item_data["original_duration_seconds"] = float(duration_for_periodic)
+        else:
+            # Si es periódico pero no se da una duración válida, no tiene sentido. Lo hacemos no periódico.
+            log_message(f"WARN: Item '{item_path}' marcado como periodico pero sin original_duration_seconds valido ({duration_for_periodic}). Se tratara como no periodico.")
+            new_item_data["periodic"] = False
+    if max_bytes is not None:
+        # Tope de tamaño: el checker borra los archivos mas antiguos de la carpeta si lo supera
+        if new_item_data["periodic"] and new_item_data["is_dir"] and int(max_bytes) > 0:
+            new_item_data["max_bytes"] = int(max_bytes)
+        else:
+            log_message(f"WARN: El tope de tamaño solo se aplica a carpetas periodicas existentes. Se ignora para '{item_path}'.")
+    return new_item_data
+
+RULE_AGE_FIELDS = ('mtime', 'atime')
+
+def make_rule_item(root, pattern, older_than_seconds, interval_seconds=None, age_field='mtime', recursive=True):
+    # Regla de retencion: en cada pasada se borran los archivos bajo 'root' cuyo nombre cumple 'pattern'
+    # (fnmatch, p.ej. '*.tmp') y con mtime/atime de hace mas de older_than_seconds. Se guarda como un
+    # item periodico cuyo path es root/pattern; 'interval_seconds' es cada cuanto se evalua.
+    older_than_seconds = float(older_than_seconds)
+    if older_than_seconds <= 0: raise ValueError("La antigüedad de la regla debe ser > 0")
+    if not pattern or os.sep in pattern or (os.altsep and os.altsep in pattern): raise ValueError(f"Patron invalido: {pattern!r}")
+    if age_field not in RULE_AGE_FIELDS: raise ValueError(f"Campo de antigüedad invalido: {age_field!r}")
+    if interval_seconds is None: interval_seconds = min(max(older_than_seconds / 4, 3600), 86400)
+    root = os.path.normpath(os.path.abspath(root))
+    if not os.path.isdir(root): log_message(f"INFO: La carpeta de la regla '{root}' no existe actualmente, pero se añadirá.")
+    rule = {"root": root, "pattern": pattern, "older_than": older_than_seconds, "age": age_field, "recursive": bool(recursive)}
+    return {"path": os.path.join(root, pattern), "delete_at": time.time() + float(interval_seconds), "is_dir": False,
+            "periodic": True, "original_duration_seconds": float(interval_seconds), "rule": rule}
+
+def add_rule(root, pattern, older_than_seconds, interval_seconds=None, age_field='mtime', recursive=True):
+    item = make_rule_item(root, pattern, older_than_seconds, interval_seconds, age_field, recursive)
+    if not append_records([{"op": "add", "item": item}]): return False
+    log_message(f"Regla '{item['path']}' programada: archivos con {age_field} de hace mas de {older_than_seconds / 86400:g} dias. Primera pasada: {datetime.datetime.fromtimestamp(item['delete_at'])}")
+    return True
+
+def add_item_to_schedule(item_path, delete_timestamp, is_periodic_item=False, duration_for_periodic=None):
+    # Alta o actualizacion (el registro 'add' reemplaza cualquier item previo con el mismo path)
+    new_item_data = make_item(item_path, delete_timestamp, is_periodic_item, duration_for_periodic)
+    if not append_records([{"op": "add", "item": new_item_data}]): return False
+    log_message(f"'{os.path.basename(new_item_data['path'])}' programado. Periódico: {new_item_data['periodic']}. Borrado: {datetime.datetime.fromtimestamp(new_item_data['delete_at'])}")
+    return True
+
+def add_items(entries):
+    # Alta/actualizacion en bloque: entries = [(path, delete_at, periodic, duration[, max_bytes])].
+    # Un solo lock y un solo append al journal para toda la seleccion; si un path se repite gana el ultimo.
+    items = {}
+    for entry in entries:
+        new_item_data = make_item(*entry)
+        items[new_item_data['path']] = new_item_data
+    if not items: return True
+    if not append_records([{"op": "add", "item": item} for item in items.values()]): return False
+    if len(items) == 1:
+        item = next(iter(items.values()))
+        log_message(f"'{os.path.basename(item['path'])}' programado. Periódico: {item['periodic']}. Borrado: {datetime.datetime.fromtimestamp(item['delete_at'])}")
+    else: log_message(f"{len(items)} items programados en bloque.")
+    return True
+
+def remove_items(item_paths):
+    paths = {os.path.normpath(p) for p in item_paths}
+    if not paths: return True
+    if not append_records([{"op": "remove", "path": p} for p in paths]): return False
+    log_message(f"Eliminados de la lista: {len(paths)} items.")
+    return True
+
+def remove_item_from_schedule(item_path):
+    normalized_path_to_remove = os.path.normpath(item_path)
+    if not append_records([{"op": "remove", "path": normalized_path_to_remove}]): return False
+    log_message(f"Eliminado de la lista: {normalized_path_to_remove}")
+    return True
+
+def remove_record(path, if_delete_at=None):
+    record = {"op": "remove", "path": os.path.normpath(path)}
+    if if_delete_at is not None: record["if_delete_at"] = if_delete_at
+    return record
+
+def reschedule_record(path, delete_at, if_delete_at=None):
+    record = {"op": "reschedule", "path": os.path.normpath(path), "delete_at": float(delete_at)}
+    if if_delete_at is not None: record["if_delete_at"] = if_delete_at
+    return record
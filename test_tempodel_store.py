@@ -0,0 +1,41 @@
+import importlib
+import os
+import time
+
+import pytest
+
+# Replay y recuperacion del journal del store JSON (cada test con su propia carpeta de datos)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEMPODEL_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("TEMPODEL_STORE", "json")
+    monkeypatch.delenv("TEMPODEL_SHARD_ROOTS", raising=False)
+    import tempodel_store
+    return importlib.reload(tempodel_store)
+
+def _paths(store):
+    return sorted(item.path for item in store.load_items())
+
+def test_journal_replay(store, tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    later = time.time() + 3600
+    assert store.add_items([(a, later, False, None), (b, later, False, None)])
+    assert store.remove_items([a])
+    assert _paths(store) == [b]
+    assert store.compact_schedule()
+    assert _paths(store) == [b]
+
+def test_append_after_torn_write(store, tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    assert store.add_item_to_schedule(a, time.time() + 3600)
+    with open(store.JOURNAL_FILE, 'ab') as jf: jf.write(b'{"op": "add", "item": {"path": "x')
+    assert store.add_item_to_schedule(b, time.time() + 3600)
+    assert _paths(store) == [a, b]
+    with open(store.JOURNAL_FILE, 'rb') as jf: assert jf.read().endswith(b"\n")
+
+def test_torn_header(store, tmp_path):
+    with open(store.JOURNAL_FILE, 'wb') as jf: jf.write(b'{"journal": 1, "gen')
+    b = str(tmp_path / "b")
+    assert store.add_item_to_schedule(b, time.time() + 3600)
+    assert _paths(store) == [b]